@@ -0,0 +1,202 @@
+import argparse # Command line options of the service
+import asyncio # Event loop: many requests at the same time in one process
+import math # NaN values become null in the JSON answers
+import re # Short names of the lakes in the URLs
+import time # Age of the cached forecasts
+from datetime import date, timedelta # Default date and the following day of a forecast
+import aiohttp # Non-blocking HTTP client for the forecast API
+from aiohttp import web # Non-blocking HTTP server
+import drift # Drift metrics of the model inputs
+import locations # Geocoding and distances to the lakes
+import wave_model # Loads the wave height model once per server process and caches the predictions
+import weather # Forecast API, request parameters and parsing
+from lakes import swiss_lakes # List of the lakes with coordinates and webcam links
+
+
+# JSON service for other clients (notice screens, mobile app) with the same forecasts and predictions as the app:
+#   GET /lakes                                     all lakes
+#   GET /lakes/nearby?lat=47.37&lon=8.54&radius_km=20   (or ?q=Zurich) lakes within the radius with their distance
+#   GET /lakes/{lake}/forecast?date=YYYY-MM-DD     hourly forecast of that date (today to today + 14 days)
+#   GET /lakes/{lake}/predictions?date=YYYY-MM-DD  wave height of every hour of that date with the likely range
+#       (&bands=false: without the range, from the lookup table if wave_model.USE_LOOKUP_TABLE is on, which is also
+#        the default then; &bands=true: always with the range of the single trees)
+#   GET /metrics                                   prediction cache, loaded models and input drift (Prometheus text format)
+# {lake} is the name ("Lake Zug") or its short form ("lake_zug").
+
+# A forecast is fetched once per lake and date range and then shared by all requests for FORECAST_TTL_SECONDS
+FORECAST_TTL_SECONDS = 600
+
+# Dates which can be requested: today to today + FORECAST_DAYS (the same range as the date picker of the app)
+FORECAST_DAYS = 14
+
+_forecasts = {} # (lake name, start date, end date) -> (time of the download, forecast DataFrame)
+_forecasts_in_flight = {} # Same key -> asyncio task, so simultaneous requests wait for ONE download
+
+
+def lake_slug(lake):
+    return re.sub("[^a-z0-9]+", "_", lake["name"].lower()).strip("_")
+
+
+def find_lake(name):
+    for lake in swiss_lakes:
+        if name.lower() in (lake["name"].lower(), lake_slug(lake)):
+            return lake
+    raise web.HTTPNotFound(text=f"Unknown lake {name}")
+
+
+def lake_json(lake, **extra):
+    return {"name": lake["name"], "slug": lake_slug(lake), "latitude": lake["latitude"], "longitude": lake["longitude"],
+            "webcam_url": lake["webcam_url"], **extra}
+
+
+# DataFrame indexed by time -> list of dictionaries, NaN becomes null
+def records(frame, time_field):
+    return [{time_field: index.isoformat(), **{column: None if isinstance(value, float) and math.isnan(value) else value
+                                               for column, value in row.items()}}
+            for index, row in zip(frame.index, frame.to_dict("records"))]
+
+
+def request_date(request):
+    today = date.today()
+    try:
+        day = date.fromisoformat(request.query.get("date", today.isoformat()))
+    except ValueError:
+        raise web.HTTPBadRequest(text="date must have the format YYYY-MM-DD")
+    if not today <= day <= today + timedelta(days=FORECAST_DAYS):
+        raise web.HTTPBadRequest(text=f"date must be between {today} and {today + timedelta(days=FORECAST_DAYS)}")
+    return day
+
+
+# Here we get the forecast of a lake for the selected date and the following day (for the 3-hour windows in the late
+# evening), from the cache or with a non-blocking request to the forecast API
+async def lake_forecast(app, lake, day):
+    start, end = day.isoformat(), (day + timedelta(days=1)).isoformat()
+    key = (lake["name"], start, end)
+    cached = _forecasts.get(key)
+    if cached is not None and time.monotonic() - cached[0] < FORECAST_TTL_SECONDS:
+        return cached[1]
+    if key not in _forecasts_in_flight:
+        _forecasts_in_flight[key] = asyncio.ensure_future(_download_forecast(app, lake, start, end))
+    try:
+        forecast = await asyncio.shield(_forecasts_in_flight[key])
+    finally:
+        _forecasts_in_flight.pop(key, None)
+    now = time.monotonic()
+    for old_key in [old_key for old_key, (downloaded, _) in _forecasts.items() if now - downloaded >= FORECAST_TTL_SECONDS]:
+        del _forecasts[old_key] # Expired forecasts (e.g. of past dates) are never used again
+    _forecasts[key] = (now, forecast)
+    return forecast
+
+
+async def _download_forecast(app, lake, start, end):
+    params = weather.forecast_params([lake], start, end)
+    try:
+        async with app["http"].get(app["forecast_url"], params=params, timeout=aiohttp.ClientTimeout(total=30)) as response:
+            response.raise_for_status()
+            data = await response.json()
+    except aiohttp.ClientError as error:
+        raise web.HTTPBadGateway(text=f"Unable to retrieve weather data ({error})")
+    return weather.parse_forecasts([lake], data)[lake["name"]]
+
+
+async def get_lakes(request):
+    return web.json_response([lake_json(lake) for lake in swiss_lakes])
+
+
+async def get_nearby_lakes(request):
+    try:
+        radius_km = float(request.query.get("radius_km", 20))
+        if "q" in request.query: # Geocoding is a blocking request, it runs in a worker thread
+            location = await asyncio.to_thread(locations.geocode, request.query["q"])
+            if location is None:
+                raise web.HTTPNotFound(text=f"Location {request.query['q']} not found")
+            latitude, longitude = location.latitude, location.longitude
+        else:
+            latitude, longitude = float(request.query["lat"]), float(request.query["lon"])
+    except (KeyError, ValueError):
+        raise web.HTTPBadRequest(text="Use ?lat=..&lon=.. or ?q=place, and optionally &radius_km=..")
+    nearby = locations.nearby_lakes(latitude, longitude, radius_km)
+    return web.json_response({
+        "latitude": latitude,
+        "longitude": longitude,
+        "radius_km": radius_km,
+        "lakes": [lake_json(lake, distance_km=round(distance, 2)) for lake, distance in nearby],
+    })
+
+
+async def get_forecast(request):
+    lake = find_lake(request.match_info["lake"])
+    day = request_date(request)
+    forecast = await lake_forecast(request.app, lake, day)
+    return web.json_response({"lake": lake["name"], "date": day.isoformat(),
+                              "hours": records(forecast.loc[day.isoformat()], "time")})
+
+
+async def get_predictions(request):
+    lake = find_lake(request.match_info["lake"])
+    day = request_date(request)
+    bands = request.query.get("bands")
+    if bands not in (None, "true", "false"):
+        raise web.HTTPBadRequest(text="bands must be true or false")
+    forecast = await lake_forecast(request.app, lake, day)
+    # The prediction uses the CPU, so it runs in a worker thread and the event loop keeps answering other requests
+    curve = await asyncio.to_thread(wave_model.day_curve, lake["name"], forecast, day, None if bands is None else bands == "true")
+    if curve["wave_height"].isna().all():
+        raise web.HTTPNotFound(text=f"Wave height predictions are not available for {day}")
+    headline_hour, next_hours = wave_model.headline_hour(curve)
+    return web.json_response({
+        "lake": lake["name"],
+        "date": day.isoformat(),
+        "headline": {"window_start": headline_hour.isoformat(), "kind": "next_3_hours" if next_hours else "daily_peak",
+                     **records(curve.loc[[headline_hour]], "window_start")[0]},
+        "windows": records(curve, "window_start"),
+    })
+
+
+async def get_metrics(request):
+    lines = [f"windlgate_prediction_cache_{name} {value}" for name, value in wave_model.prediction_cache_stats().items()]
+    lines += [f"windlgate_forecast_cache_entries {len(_forecasts)}", f"windlgate_model_errors {len(wave_model.model_errors())}"]
+    for stats in wave_model.model_stats():
+        lines.append(f'windlgate_model_load_seconds{{path="{stats["path"]}"}} {stats["load_seconds"]}')
+    return web.Response(text="\n".join(lines) + "\n" + drift.metrics_text(), content_type="text/plain")
+
+
+async def get_health(request):
+    return web.json_response({"status": "ok"})
+
+
+# One HTTP client session per process (keeps the connections to the forecast API open)
+async def http_session(app):
+    app["http"] = aiohttp.ClientSession()
+    yield
+    await app["http"].close()
+
+
+def create_app(forecast_url=weather.FORECAST_URL):
+    app = web.Application()
+    app["forecast_url"] = forecast_url
+    app.cleanup_ctx.append(http_session)
+    app.router.add_get("/health", get_health)
+    app.router.add_get("/lakes", get_lakes)
+    app.router.add_get("/lakes/nearby", get_nearby_lakes)
+    app.router.add_get("/lakes/{lake}/forecast", get_forecast)
+    app.router.add_get("/lakes/{lake}/predictions", get_predictions)
+    app.router.add_get("/metrics", get_metrics)
+    return app
+
+
+# Command line: python api.py [--port 8080] [--forecast-url http://localhost:8765/v1/forecast]
+# One process uses one core, for more cores start several processes with --reuse-port on the same port
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="JSON API for the lake forecasts and wave height predictions")
+    parser.add_argument("--host", default="0.0.0.0", help="address to listen on")
+    parser.add_argument("--port", type=int, default=8080, help="port to listen on")
+    parser.add_argument("--forecast-url", default=weather.FORECAST_URL, help="forecast API (e.g. the stand-in server of download_archive.py)")
+    parser.add_argument("--reuse-port", action="store_true", help="allow several processes on the same port")
+    args = parser.parse_args(argv)
+    wave_model.get_current_model() # Load the model before the first request
+    web.run_app(create_app(args.forecast_url), host=args.host, port=args.port, reuse_port=args.reuse_port, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import argparse # Command line options of the benchmark
+import asyncio # Many client connections at the same time
+import os # Clock ticks per second of the CPU time in /proc
+import subprocess # The stand-in forecast API and the service run in their own processes
+import sys # Path of the Python interpreter
+import time # Duration of every scenario
+from datetime import date # Date of the requests
+import aiohttp # Non-blocking HTTP client
+
+
+# Requests which are sent in every scenario (the lakes rotate, so several forecasts and predictions are cached)
+LAKES = ["lake_zurich", "lake_zug", "lake_aegeri", "lake_thunersee"]
+SCENARIOS = {
+    "nearby": lambda index: "/lakes/nearby?lat=47.37&lon=8.54&radius_km=60",
+    "forecast": lambda index: f"/lakes/{LAKES[index % len(LAKES)]}/forecast?date={date.today()}",
+    "predictions": lambda index: f"/lakes/{LAKES[index % len(LAKES)]}/predictions?date={date.today()}",
+}
+
+
+# CPU time (user + system, in seconds) which a process has used so far, from /proc/<pid>/stat (Linux)
+def cpu_seconds(pid):
+    with open(f"/proc/{pid}/stat") as stat_file:
+        fields = stat_file.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+# Here "concurrency" clients send requests one after the other for "seconds" seconds
+async def run_scenario(base_url, path_for, concurrency, seconds):
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + seconds
+
+    async def client(number):
+        nonlocal errors
+        index = number
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            async with session.get(base_url + path_for(index)) as response:
+                await response.read()
+                if response.status != 200:
+                    errors += 1
+            latencies.append(time.perf_counter() - start)
+            index += concurrency
+
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=concurrency)) as session:
+        await asyncio.gather(*(client(number) for number in range(concurrency)))
+    latencies.sort()
+    return len(latencies), errors, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)]
+
+
+async def wait_until_ready(url, seconds=60):
+    deadline = time.perf_counter() + seconds
+    async with aiohttp.ClientSession() as session:
+        while True:
+            try:
+                async with session.get(url) as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                if time.perf_counter() > deadline:
+                    raise
+            await asyncio.sleep(0.2)
+
+
+# Command line: python benchmark_api.py [--concurrency 32] [--seconds 10]
+# Starts the stand-in forecast API (download_archive.py --serve) and ONE service process (api.py), warms the caches
+# and measures every scenario. Requests per core = requests / CPU seconds which the service process used.
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Throughput of the JSON API")
+    parser.add_argument("--port", type=int, default=8080, help="port of the service")
+    parser.add_argument("--upstream-port", type=int, default=8765, help="port of the stand-in forecast API")
+    parser.add_argument("--concurrency", type=int, default=32, help="clients at the same time")
+    parser.add_argument("--seconds", type=float, default=10, help="duration of every scenario")
+    args = parser.parse_args(argv)
+
+    folder = os.path.dirname(os.path.abspath(__file__))
+    upstream = subprocess.Popen([sys.executable, "download_archive.py", "--serve", str(args.upstream_port)], cwd=folder, stdout=subprocess.DEVNULL)
+    service = subprocess.Popen([sys.executable, "api.py", "--port", str(args.port), "--host", "127.0.0.1",
+                                "--forecast-url", f"http://localhost:{args.upstream_port}/v1/forecast"], cwd=folder, stdout=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        asyncio.run(wait_until_ready(base_url + "/health"))
+        asyncio.run(run_scenario(base_url, SCENARIOS["predictions"], len(LAKES), 1)) # Fill the forecast and prediction caches
+        print(f"{'scenario':<12} {'requests':>9} {'errors':>7} {'req/s':>8} {'req/s per core':>15} {'p50 ms':>8} {'p99 ms':>8}")
+        for name, path_for in SCENARIOS.items():
+            cpu_before, start = cpu_seconds(service.pid), time.perf_counter()
+            requests, errors, p50, p99 = asyncio.run(run_scenario(base_url, path_for, args.concurrency, args.seconds))
+            elapsed, cpu_used = time.perf_counter() - start, cpu_seconds(service.pid) - cpu_before
+            print(f"{name:<12} {requests:>9} {errors:>7} {requests / elapsed:>8.0f} {requests / max(cpu_used, 1e-9):>15.0f} "
+                  f"{p50 * 1000:>8.1f} {p99 * 1000:>8.1f}")
+    finally:
+        service.terminate()
+        upstream.terminate()
+
+
+if __name__ == "__main__":
+    main()
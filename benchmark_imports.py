@@ -0,0 +1,76 @@
+import argparse # Command line options of the benchmark
+import csv # The results can be appended to a CSV file to follow them over time
+import os # Checks if the CSV file exists
+import subprocess # Every measurement runs in a fresh Python process (a cold worker)
+import sys # Path of the Python interpreter
+import time # Wall clock time of the fresh process
+from datetime import datetime # Date of the measurement in the CSV file
+
+
+# Imports of Windlgate_V7.py before the lazy imports (everything was imported at the top on every start)
+BEFORE = [
+    "import streamlit", "import geopy.geocoders", "import geopy.distance", "import folium", "import streamlit_folium",
+    "import datetime", "import requests", "import pandas", "import matplotlib.pyplot", "import streamlit.components.v1",
+    "import json", "import sklearn.ensemble", "import sklearn.model_selection", "import sklearn.metrics", "import numpy",
+    "import matplotlib.dates", "import charts", "import wave_model", "import weather", "import lakes",
+]
+
+# Imports of the code paths of the app now: every path adds its modules to the imports at the top of the script
+STARTUP = ["import streamlit", "import datetime", "import lakes"]
+PATHS = {
+    "before": BEFORE,
+    "startup": STARTUP,
+    "map view": STARTUP + ["import folium", "import streamlit_folium", "import locations"],
+    "detail view": STARTUP + ["import requests", "import pandas", "import charts", "import weather", "import wave_model"],
+    # Loading the model unpickles the forest, which imports scikit-learn's tree modules
+    "prediction": STARTUP + ["import requests", "import pandas", "import charts", "import weather", "import wave_model", "import sklearn.ensemble"],
+}
+
+
+# Here we run the imports in a fresh process with "python -X importtime" and add up the "self" time of every module
+# Returns (total import time in ms, wall clock time of the process in ms, number of imported modules)
+def measure(statements):
+    code = "\n".join(statements)
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    wall_ms = (time.perf_counter() - start) * 1000
+    if result.returncode != 0:
+        raise ImportError(result.stderr.strip().splitlines()[-1])
+    self_us = [int(line.split("|")[0].split(":")[1]) for line in result.stderr.splitlines()
+               if line.startswith("import time:") and line.split("|")[0].split(":")[1].strip().isdigit()]
+    return sum(self_us) / 1000, wall_ms, len(self_us)
+
+
+# Command line: python benchmark_imports.py [--repeat 5] [--output import_times.csv]
+# Prints the fastest of "repeat" fresh processes for every path, with --output the results are appended to a CSV file
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import time of the code paths of the app (cold worker start)")
+    parser.add_argument("--repeat", type=int, default=5, help="fresh processes per path, the fastest one counts")
+    parser.add_argument("--output", default=None, help="CSV file to which the results are appended")
+    args = parser.parse_args(argv)
+
+    rows = []
+    print(f"{'path':<12} {'imports ms':>11} {'process ms':>11} {'modules':>8}")
+    for path, statements in PATHS.items():
+        try:
+            import_ms, wall_ms, modules = min(measure(statements) for _ in range(args.repeat))
+        except ImportError as error: # e.g. streamlit or folium is not installed on this machine
+            print(f"{path:<12} not available ({error})")
+            continue
+        rows.append({"date": datetime.now().isoformat(timespec="seconds"), "path": path, "import_ms": round(import_ms, 1),
+                     "process_ms": round(wall_ms, 1), "modules": modules})
+        print(f"{path:<12} {import_ms:>11.1f} {wall_ms:>11.1f} {modules:>8}")
+
+    if args.output:
+        new_file = not os.path.exists(args.output)
+        with open(args.output, "a", newline="", encoding="utf-8") as output_file:
+            writer = csv.DictWriter(output_file, fieldnames=["date", "path", "import_ms", "process_ms", "modules"])
+            if new_file:
+                writer.writeheader()
+            writer.writerows(rows)
+    return rows
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import argparse # Command line options of the dataset builder
+import glob # Several input files, e.g. one archive file per lake and year
+import time # Measures how long building the table takes
+import pandas as pd # Helps to configurate the datasets
+from features import FEATURE_COLUMNS, WINDOW_HOURS, rolling_features # Same feature rows as in the live predictions
+from weather import HOURLY_VARIABLES # API variable names -> column names of the app
+
+
+# Here we read one or more tables (CSV or Parquet, glob patterns are allowed) into one DataFrame
+def read_tables(patterns):
+    paths = sorted(path for pattern in patterns for path in (glob.glob(pattern) or [pattern]))
+    return pd.concat([pd.read_parquet(path) if path.endswith(".parquet") else pd.read_csv(path) for path in paths], ignore_index=True)
+
+
+# The app works with local Swiss time without time zone (like the forecasts, timezone "Europe/Zurich")
+def local_times(values):
+    times = pd.to_datetime(values)
+    if times.dt.tz is not None:
+        times = times.dt.tz_convert("Europe/Zurich").dt.tz_localize(None)
+    return times.astype("datetime64[ns]") # CSV and Parquet files can have different resolutions, the join needs the same
+
+
+# Historical weather: columns "lake", "Time" (or "time") and the six weather variables, either with the names of the
+# API (e.g. "windspeed_10m") or of the app (e.g. "Wind Speed (m/s)")
+def prepare_weather(weather):
+    weather = weather.rename(columns={"time": "Time", **HOURLY_VARIABLES})
+    missing = [column for column in ["lake", "Time"] + FEATURE_COLUMNS if column not in weather.columns]
+    if missing:
+        raise ValueError(f"Weather data is missing the columns {missing}")
+    weather = weather[["lake", "Time"] + FEATURE_COLUMNS].assign(Time=local_times(weather["Time"]))
+    # Overlapping downloads contain some hours twice, the last one wins
+    return weather.drop_duplicates(["lake", "Time"], keep="last")
+
+
+# Wave observations: columns "lake", "Time" (or "time", the time of the measurement) and "wave_height" in meters
+def prepare_observations(observations):
+    observations = observations.rename(columns={"time": "Time"})
+    missing = [column for column in ["lake", "Time", "wave_height"] if column not in observations.columns]
+    if missing:
+        raise ValueError(f"Wave observations are missing the columns {missing}")
+    observations = observations[["lake", "Time", "wave_height"]].dropna()
+    return observations.assign(Time=local_times(observations["Time"])).rename(columns={"Time": "observation_time"})
+
+
+# Here we build the training table: the feature rows of every lake come from the same rolling 3-hour means as the live
+# predictions (features.rolling_features), then every observation is joined with a window whose hours contain it.
+# A window which starts at s averages the weather of the hours after s up to s + 3 h, so an observation at T lies in
+# the windows with a start in [T - 3 h, T). The as-of join takes the latest of them: the last window start at or before
+# T - 1 h, at most 2 h earlier (e.g. 14:37 -> window 13:00 with the hours 14:00 - 16:00, 15:00 -> window 14:00).
+# Observations without weather for such a window are dropped.
+def build(weather, observations, hours=WINDOW_HOURS):
+    weather = prepare_weather(weather)
+    observations = prepare_observations(observations)
+
+    feature_rows = []
+    for lake, lake_weather in weather.groupby("lake", sort=False):
+        lake_features = rolling_features(lake_weather.set_index("Time").sort_index(), hours)
+        feature_rows.append(lake_features.rename_axis("window_start").reset_index().assign(lake=lake))
+    feature_rows = pd.concat(feature_rows, ignore_index=True).sort_values("window_start")
+
+    observations = observations.assign(latest_start=observations["observation_time"] - pd.Timedelta(hours=1))
+    dataset = pd.merge_asof(
+        observations.sort_values("latest_start"),
+        feature_rows,
+        left_on="latest_start",
+        right_on="window_start",
+        by="lake",
+        direction="backward",
+        tolerance=pd.Timedelta(hours=hours - 1),
+    )
+    dataset = dataset.dropna(subset=FEATURE_COLUMNS) # No weather data for the window
+    columns = ["lake", "window_start", "observation_time"] + FEATURE_COLUMNS + ["wave_height"]
+    return dataset[columns].sort_values(["lake", "observation_time"]).reset_index(drop=True)
+
+
+# Command line: python build_dataset.py --weather "archive/*.parquet" --observations waves.csv --output training.parquet
+# The output is read directly by train_model.py (--data training.parquet)
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the training table of the wave height model")
+    parser.add_argument("--weather", nargs="+", required=True, help="hourly weather history (CSV or Parquet files or patterns)")
+    parser.add_argument("--observations", nargs="+", required=True, help="wave height observations (CSV or Parquet files or patterns)")
+    parser.add_argument("--output", default="training.parquet", help="training table (.parquet, or .csv)")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    weather = read_tables(args.weather)
+    observations = read_tables(args.observations)
+    read_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    dataset = build(weather, observations)
+    build_seconds = time.perf_counter() - start
+
+    if args.output.endswith(".csv"):
+        dataset.to_csv(args.output, index=False)
+    else:
+        dataset.to_parquet(args.output, index=False, compression="zstd")
+    print(f"{len(dataset)} of {len(observations)} observations from {dataset['lake'].nunique()} lakes "
+          f"({len(weather)} weather hours) -> {args.output}, read {read_seconds:.1f} s, built {build_seconds:.1f} s")
+    return dataset
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,386 @@
+import multiprocessing # Start method for the worker processes which render the charts
+import os # Number of CPU cores for the render pool
+import sys # Used to check whether pyplot was imported somewhere else
+import threading # Several Streamlit sessions can render charts at the same time
+import weakref # Lets us count the figures which are still alive without keeping them alive
+from collections import OrderedDict # Dictionary that remembers the order in which the charts were used
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed # Worker pools for parallel rendering
+from io import BytesIO # Keeps the rendered PNG image in memory
+import pandas as pd # Helps to configurate the datasets
+import matplotlib.style # Matplotlib styles (we only use the dark background)
+import matplotlib.dates as mdates # Provides functions for handling and formatting data
+from matplotlib.artist import setp # Sets properties (e.g. the rotation) of several labels at once
+from matplotlib.backends.backend_agg import FigureCanvasAgg # Renders a figure to a PNG image without a GUI
+from matplotlib.figure import Figure # Figure objects which are not registered in pyplot's global figure list
+from process_stats import resident_memory_mb # Memory usage of the server process
+from weather import forecast_hash # Fingerprint of the forecast data
+
+
+# Styling which is shared by all charts, it is part of the cache key so that a changed style never shows an old image
+CHART_STYLE = {
+    "theme": "dark_background",
+    "dpi": 100,
+}
+
+# Column of the forecast -> (short field name for the browser, line color), shared by the image and the client-side charts
+SERIES = {
+    "Temperature (°C)": ("temperature", "cyan"),
+    "Wind Speed (m/s)": ("wind_speed", "#8000ff"),
+    "Precipitation (mm)": ("precipitation", "lightblue"),
+    "Solar irradiation (watt)": ("irradiation", "orange"),
+    "Luftdruck (hPa)": ("pressure", "skyblue"),
+    "rel. Luftfeuchtigkeit (%)": ("humidity", "#1f77b4"),
+}
+
+# Line color of the wave height forecast
+WAVE_HEIGHT_COLOR = "#00e5a0"
+
+# Here we set the style once when the module is imported (once per server process) instead of on every rerun
+matplotlib.style.use(CHART_STYLE["theme"])
+
+# Here we limit the memory of the rendered charts: a combined forecast chart is about 300 KB, so 32 MB keep roughly
+# the last 100 lake and date views (a limit on the number of entries would let large images fill the memory)
+MAX_CACHED_CHART_BYTES = 32 * 1024 ** 2
+
+# Process wide cache: key -> PNG bytes, shared by all sessions of the Streamlit server
+_chart_cache = OrderedDict()
+_chart_cache_lock = threading.Lock()
+_chart_cache_bytes = 0 # Total size of the cached PNG images
+
+# Counters for the memory report: how many figures were drawn and which ones are still alive
+_live_figures = weakref.WeakSet()
+_figures_rendered = 0
+
+
+
+# Temperature and wind speed
+def draw_temperature_wind(ax, forecast):
+    ax.plot(forecast.index, forecast["Temperature (°C)"], marker='o', markersize=5, label='Temperature (°C)', linestyle='-', linewidth=2, color=SERIES["Temperature (°C)"][1], alpha =0.9)
+    ax.plot(forecast.index, forecast["Wind Speed (m/s)"], marker='o', markersize=5, label='Wind Speed (m/s)', linestyle='-', linewidth=2, color=SERIES["Wind Speed (m/s)"][1], alpha =0.9)
+    ax.set_ylabel('Values', fontsize=12)
+    ax.legend(fontsize=12, loc='upper left', facecolor='black', edgecolor='white')
+
+
+# Precipitation
+def draw_precipitation(ax, forecast):
+    ax.plot(forecast.index, forecast["Precipitation (mm)"], marker='o', markersize=5, linestyle='-', linewidth=2, color=SERIES["Precipitation (mm)"][1])
+    ax.set_ylabel('Precipitation (mm)', fontsize=12)
+
+
+# Solar irradiation
+def draw_solar_irradiation(ax, forecast):
+    ax.plot(forecast.index, forecast["Solar irradiation (watt)"], marker='o', markersize=5, linestyle='-', linewidth=2, color=SERIES["Solar irradiation (watt)"][1])
+    ax.set_ylabel('Solar Irradiation (watt)', fontsize=12)
+
+
+# Dynamic limits for the pressure axis (±2 hPa, between 800 and 1050)
+def pressure_limits(forecast):
+    min_pressure = forecast["Luftdruck (hPa)"].min()
+    max_pressure = forecast["Luftdruck (hPa)"].max()
+    return [float(max(800, min_pressure - 2)), float(min(1050, max_pressure + 2))]
+
+
+# Air pressure
+def draw_air_pressure(ax, forecast):
+    ax.plot(forecast.index, forecast["Luftdruck (hPa)"], color=SERIES["Luftdruck (hPa)"][1], linewidth=2, marker='o', markersize=5)
+    ax.set_ylabel("Air Pressure (hPa)", fontsize=12)
+    ax.set_ylim(*pressure_limits(forecast))
+
+
+# Relative humidity
+def draw_humidity(ax, forecast):
+    ax.plot(forecast.index, forecast["rel. Luftfeuchtigkeit (%)"], color=SERIES["rel. Luftfeuchtigkeit (%)"][1], linewidth=2, marker='o', markersize=5)
+    ax.set_ylabel("Relative Humidity (%)", fontsize=12)
+    ax.set_ylim(0, 105)  # Assuming relative humidity is between 0% and 105%
+
+
+# The five panels of the detail page in the order in which they are displayed: (title, function which draws the panel)
+PANELS = [
+    ("Temperature and Wind Speed", draw_temperature_wind),
+    ("Precipitation", draw_precipitation),
+    ("Solar Irradiation", draw_solar_irradiation),
+    ("Air Pressure", draw_air_pressure),
+    ("Relative Humidity", draw_humidity),
+]
+
+
+# Function to plot the given panels as vertically stacked subplots which share the time axis
+# (one figure means only one layout calculation and one PNG encoding instead of five)
+def plot_forecast_panels(forecast, panels=PANELS):
+    fig = Figure(figsize=(12, 4.4 * len(panels)))
+    FigureCanvasAgg(fig) # Attach the Agg canvas, the figure never touches pyplot
+    axes = fig.subplots(len(panels), 1, sharex=True, squeeze=False)[:, 0]
+
+    for ax, (title, draw_panel) in zip(axes, panels):
+        draw_panel(ax, forecast)
+        ax.set_title(title, fontsize=14)
+        ax.tick_params(axis='y', labelsize=12)
+        ax.grid(visible=True, alpha=0.3, linestyle='--')
+
+    # The time axis is shared, so we only have to format the bottom panel
+    ax_bottom = axes[-1]
+    ax_bottom.set_xlabel("Time (hours)", fontsize=12)
+    ax_bottom.xaxis.set_major_locator(mdates.HourLocator(interval=3)) # Tick every 3 hours
+    ax_bottom.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M'))
+    setp(ax_bottom.xaxis.get_majorticklabels(), rotation=45, ha='right')
+    ax_bottom.tick_params(axis='x', labelsize=10)
+
+    fig.tight_layout()
+    return fig
+
+
+# Function to plot the predicted wave height for every hour of the selected date
+# wave_curve: DataFrame indexed by time with "wave_height" and optionally "wave_height_low"/"wave_height_high"
+def plot_wave_height_curve(wave_curve):
+    fig = Figure(figsize=(12, 5))
+    FigureCanvasAgg(fig)
+    ax = fig.subplots()
+    if "wave_height_low" in wave_curve.columns: # Range of the single trees of the forest
+        ax.fill_between(wave_curve.index, wave_curve["wave_height_low"], wave_curve["wave_height_high"], color=WAVE_HEIGHT_COLOR, alpha=0.25, linewidth=0, label="Range of the trees (10-90 %)")
+    ax.plot(wave_curve.index, wave_curve["wave_height"], marker='o', markersize=5, linestyle='-', linewidth=2, color=WAVE_HEIGHT_COLOR, label="Predicted wave height")
+    ax.legend(fontsize=12, loc='upper left', facecolor='black', edgecolor='white')
+    ax.set_ylabel("Wave Height (m)", fontsize=12)
+    ax.set_ylim(bottom=0)
+    ax.set_xlabel("Time (hours)", fontsize=12)
+    ax.xaxis.set_major_locator(mdates.HourLocator(interval=3)) # Tick every 3 hours
+    ax.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M'))
+    setp(ax.xaxis.get_majorticklabels(), rotation=45, ha='right')
+    ax.tick_params(axis='x', labelsize=10)
+    ax.tick_params(axis='y', labelsize=12)
+    ax.grid(visible=True, alpha=0.3, linestyle='--')
+    fig.tight_layout()
+    return fig
+
+
+# Function which renders a chart to PNG bytes and frees the figure right afterwards
+def render_png(plot_function, data):
+    global _figures_rendered
+    fig = plot_function(data)
+    _live_figures.add(fig)
+    _figures_rendered += 1
+    try:
+        buffer = BytesIO()
+        fig.savefig(buffer, format="png", dpi=CHART_STYLE["dpi"])
+        return buffer.getvalue()
+    finally:
+        fig.clear() # Drop all axes and lines, the figure is garbage collected as soon as it goes out of scope
+
+
+# The cache key combines the chart, the forecast fingerprint and the styling
+def _cache_key(chart_name, data):
+    return (chart_name, forecast_hash(data), repr(sorted(CHART_STYLE.items())))
+
+
+def _cache_get(key):
+    with _chart_cache_lock:
+        if key in _chart_cache:
+            _chart_cache.move_to_end(key) # Mark the chart as recently used
+            return _chart_cache[key]
+    return None
+
+
+def _cache_put(key, png):
+    global _chart_cache_bytes
+    if len(png) > MAX_CACHED_CHART_BYTES: # Would push every other chart out of the cache
+        return
+    with _chart_cache_lock:
+        if key in _chart_cache:
+            _chart_cache_bytes -= len(_chart_cache.pop(key))
+        _chart_cache[key] = png
+        _chart_cache_bytes += len(png)
+        while _chart_cache_bytes > MAX_CACHED_CHART_BYTES:
+            _, oldest = _chart_cache.popitem(last=False) # Remove the chart which was not used for the longest time
+            _chart_cache_bytes -= len(oldest)
+
+
+# Function which returns the chart as PNG bytes, the chart is only rendered if it is not in the cache yet
+def cached_chart(plot_function, data):
+    key = _cache_key(plot_function.__name__, data)
+
+    # A repeated view (e.g. after a click on a button) is only a dictionary lookup
+    png = _cache_get(key)
+    if png is None:
+        png = render_png(plot_function, data)
+        _cache_put(key, png)
+    return png
+
+
+# Parallel rendering: every panel is drawn as its own small figure in a worker pool
+# "thread" shares the memory of the server, "process" renders on all cores (matplotlib mostly holds the GIL while drawing)
+RENDER_POOL = "process"
+RENDER_WORKERS = min(len(PANELS), os.cpu_count() or 1)
+
+_render_pool = None
+_render_pool_lock = threading.Lock()
+
+
+# The pool is created on first use and then shared by all sessions of the server process
+def render_pool():
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is None:
+            if RENDER_POOL == "process":
+                # "spawn" starts clean worker processes, forking the multi-threaded Streamlit server is not safe
+                _render_pool = ProcessPoolExecutor(max_workers=RENDER_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+            else:
+                _render_pool = ThreadPoolExecutor(max_workers=RENDER_WORKERS, thread_name_prefix="chart-render")
+        return _render_pool
+
+
+# Renders one panel of PANELS as a separate chart (module level function, so it can be sent to a worker process)
+def render_panel(forecast, panel_index):
+    return render_png(lambda data: plot_forecast_panels(data, panels=[PANELS[panel_index]]), forecast)
+
+
+# Generator which yields (panel index, PNG bytes) as soon as a panel is ready: cached panels first,
+# the others in the order in which the workers finish them
+def render_panels_parallel(forecast):
+    cached, pending = [], {}
+    for panel_index, (title, _) in enumerate(PANELS):
+        key = _cache_key(f"panel {title}", forecast)
+        png = _cache_get(key)
+        if png is not None:
+            cached.append((panel_index, png))
+        else:
+            pending[render_pool().submit(render_panel, forecast, panel_index)] = (panel_index, key)
+
+    # All missing panels are already submitted, so the workers are busy while the cached panels are displayed
+    yield from cached
+    for future in as_completed(pending):
+        panel_index, key = pending[future]
+        png = future.result()
+        _cache_put(key, png)
+        yield panel_index, png
+
+
+# Client-side charts: instead of a PNG image we send the forecast values to the browser, where Vega-Lite draws the charts
+# (title, columns, y-axis title) of the panels in the same order as PANELS
+CLIENT_PANELS = [
+    ("Temperature and Wind Speed", ["Temperature (°C)", "Wind Speed (m/s)"], "Values"),
+    ("Precipitation", ["Precipitation (mm)"], "Precipitation (mm)"),
+    ("Solar Irradiation", ["Solar irradiation (watt)"], "Solar Irradiation (watt)"),
+    ("Air Pressure", ["Luftdruck (hPa)"], "Air Pressure (hPa)"),
+    ("Relative Humidity", ["rel. Luftfeuchtigkeit (%)"], "Relative Humidity (%)"),
+]
+
+# Dark theme for Vega-Lite which looks like the matplotlib "dark_background" style
+CLIENT_CHART_CONFIG = {
+    "background": "black",
+    "view": {"stroke": None},
+    "title": {"color": "white", "fontSize": 14},
+    "axis": {"labelColor": "white", "titleColor": "white", "domainColor": "white", "tickColor": "white",
+             "gridColor": "white", "gridOpacity": 0.3, "gridDash": [4, 4]},
+    "legend": {"labelColor": "white", "fillColor": "black", "strokeColor": "white", "padding": 6},
+}
+
+
+# Compact table for the browser: one "time" column and one short float column per series (rounded to 0.1)
+def client_chart_data(forecast):
+    fields = {column: field for column, (field, _) in SERIES.items()}
+    data = forecast[list(SERIES)].rename(columns=fields).round(1).astype("float32")
+    data.index.name = "time"
+    return data.reset_index()
+
+
+# Vega-Lite spec for one panel, every series is a line with points just like in the matplotlib chart
+def _client_panel(title, columns, y_title, y_domain=None):
+    layers = []
+    for column in columns:
+        field, color = SERIES[column]
+        y = {"field": field, "type": "quantitative", "title": y_title}
+        if y_domain is not None:
+            y["scale"] = {"domain": y_domain}
+        encoding = {
+            "x": {"field": "time", "type": "temporal", "title": "Time (hours)",
+                  "axis": {"format": "%H:%M", "labelAngle": -45, "tickCount": {"interval": "hour", "step": 3}}},
+            "y": y,
+            "tooltip": [{"field": "time", "type": "temporal", "format": "%H:%M"},
+                        {"field": field, "type": "quantitative", "title": column}],
+        }
+        if len(columns) > 1: # Only the temperature and wind speed panel has a legend
+            encoding["color"] = {"datum": column, "legend": {"orient": "top-left", "title": None},
+                                 "scale": {"domain": columns, "range": [SERIES[c][1] for c in columns]}}
+            mark_color = {}
+        else:
+            mark_color = {"color": color}
+        layers.append({"mark": {"type": "line", "point": True, "strokeWidth": 2, **mark_color}, "encoding": encoding})
+    return {"title": title, "width": 650, "height": 220, "layer": layers}
+
+
+# Vega-Lite spec with the five panels stacked vertically on a shared time axis (the data is passed separately)
+def client_chart_spec(forecast):
+    y_domains = {"Air Pressure": pressure_limits(forecast), "Relative Humidity": [0, 105]}
+    return {
+        "vconcat": [_client_panel(title, columns, y_title, y_domains.get(title)) for title, columns, y_title in CLIENT_PANELS],
+        "resolve": {"scale": {"x": "shared"}},
+        "config": CLIENT_CHART_CONFIG,
+    }
+
+
+# Compact table of the wave height curve for the browser
+def client_wave_height_data(wave_curve):
+    data = wave_curve.round(2).astype("float32")
+    data.index.name = "time"
+    return data.reset_index()
+
+
+# Vega-Lite spec of the wave height curve (same look as plot_wave_height_curve)
+def client_wave_height_spec(with_bands=False):
+    x = {"field": "time", "type": "temporal", "title": "Time (hours)",
+         "axis": {"format": "%H:%M", "labelAngle": -45, "tickCount": {"interval": "hour", "step": 3}}}
+    layers = []
+    if with_bands: # Range of the single trees of the forest
+        layers.append({
+            "mark": {"type": "area", "color": WAVE_HEIGHT_COLOR, "opacity": 0.25},
+            "encoding": {"x": x, "y": {"field": "wave_height_low", "type": "quantitative"}, "y2": {"field": "wave_height_high"}},
+        })
+    layers.append({
+        "mark": {"type": "line", "point": True, "strokeWidth": 2, "color": WAVE_HEIGHT_COLOR},
+        "encoding": {
+            "x": x,
+            "y": {"field": "wave_height", "type": "quantitative", "title": "Wave Height (m)", "scale": {"zero": True}},
+            "tooltip": [{"field": "time", "type": "temporal", "format": "%H:%M"},
+                        {"field": "wave_height", "type": "quantitative", "title": "Wave Height (m)", "format": ".2f"}]
+                       + ([{"field": "wave_height_low", "type": "quantitative", "title": "Low (m)", "format": ".2f"},
+                           {"field": "wave_height_high", "type": "quantitative", "title": "High (m)", "format": ".2f"}] if with_bands else []),
+        },
+    })
+    return {"width": 650, "height": 250, "layer": layers, "config": CLIENT_CHART_CONFIG}
+
+
+# Report to check that the memory stays flat: figures drawn, figures still alive, pyplot figures, cached images and RSS
+def memory_stats():
+    pyplot = sys.modules.get("matplotlib.pyplot")
+    with _chart_cache_lock:
+        cached_charts = len(_chart_cache)
+        cached_bytes = _chart_cache_bytes
+    return {
+        "figures_rendered": _figures_rendered,
+        "live_figures": len(_live_figures),
+        "pyplot_figures": len(pyplot.get_fignums()) if pyplot is not None else 0,
+        "cached_charts": cached_charts,
+        "cached_chart_mb": round(cached_bytes / 1024 ** 2, 2),
+        "rss_mb": round(resident_memory_mb(), 1),
+    }
+
+
+# Soak test: python charts.py [renders] renders many different forecasts and prints the memory report,
+# the RSS has to stay flat once the chart cache is full
+if __name__ == "__main__":
+    import numpy as np # Random forecasts for the test
+
+    renders = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    times = pd.date_range("2024-07-01", periods=24, freq="h")
+    random = np.random.default_rng(0)
+    for i in range(1, renders + 1):
+        forecast = pd.DataFrame({
+            "Temperature (°C)": random.normal(20, 5, 24),
+            "Wind Speed (m/s)": random.gamma(2, 2, 24),
+            "Precipitation (mm)": random.exponential(0.5, 24),
+            "Solar irradiation (watt)": random.uniform(0, 800, 24),
+            "Luftdruck (hPa)": random.normal(960, 3, 24),
+            "rel. Luftfeuchtigkeit (%)": random.uniform(30, 100, 24),
+        }, index=times)
+        cached_chart(plot_forecast_panels, forecast)
+        if i % 250 == 0:
+            print(i, memory_stats())
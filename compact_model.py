@@ -0,0 +1,175 @@
+import argparse # Command line options of the benchmark
+import copy # The variants are changed copies of the trained model
+import json # The report is also written as JSON
+import os # Folders and file sizes
+import time # Measures the load and prediction time
+import numpy as np # Library for compuations in Python
+from joblib import dump, load # To save and load the model variants
+from sklearn.tree._tree import Tree # Internal tree structure of scikit-learn, rebuilt for the smaller trees
+import forest_engine # The float32 variant is a compiled forest with smaller arrays
+from features import FEATURE_COLUMNS, FEATURE_HIGH, FEATURE_LOW # The six features of the model and their realistic range
+
+
+# Variants which are built and compared by default: name -> options of make_variant
+VARIANTS = {
+    "full": {},
+    "trees_50": {"n_trees": 50},
+    "trees_25": {"n_trees": 25},
+    "depth_12": {"max_depth": 12},
+    "depth_8": {"max_depth": 8},
+    "pruned_1cm": {"prune_tolerance": 0.01},
+    "float32": {"float32": True},
+    "compact": {"n_trees": 50, "max_depth": 12, "prune_tolerance": 0.01, "float32": True},
+}
+
+LEAF = -1 # Child number of a leaf in scikit-learn (TREE_LEAF)
+UNDEFINED = -2 # Feature and threshold of a leaf in scikit-learn (TREE_UNDEFINED)
+
+
+# Here we rebuild a scikit-learn tree where the nodes in "make_leaf" become leaves, the nodes below them are removed
+# In a regression tree every node stores the mean of its training rows, so a node which becomes a leaf predicts that mean
+def _rebuild_tree(tree, make_leaf):
+    state = tree.__getstate__()
+    nodes, values = state["nodes"], state["values"]
+    kept, depths = [], []
+    new_number = {}
+    stack = [(0, 0)] # (old node number, depth), the children are numbered after their parent like in scikit-learn
+    while stack:
+        node, depth = stack.pop()
+        new_number[node] = len(kept)
+        kept.append(node)
+        depths.append(depth)
+        if nodes["left_child"][node] != LEAF and not make_leaf[node]:
+            stack.append((nodes["right_child"][node], depth + 1))
+            stack.append((nodes["left_child"][node], depth + 1))
+
+    new_nodes = nodes[kept].copy()
+    for position, node in enumerate(kept):
+        if nodes["left_child"][node] == LEAF or make_leaf[node]:
+            new_nodes[position]["left_child"] = new_nodes[position]["right_child"] = LEAF
+            new_nodes[position]["feature"] = UNDEFINED
+            new_nodes[position]["threshold"] = UNDEFINED
+        else:
+            new_nodes[position]["left_child"] = new_number[nodes["left_child"][node]]
+            new_nodes[position]["right_child"] = new_number[nodes["right_child"][node]]
+
+    new_tree = Tree(tree.n_features, np.asarray(tree.n_classes, dtype=np.intp), tree.n_outputs)
+    new_tree.__setstate__({"max_depth": max(depths), "node_count": len(kept), "nodes": new_nodes, "values": values[kept].copy()})
+    return new_tree
+
+
+# Nodes at the depth "max_depth" become leaves
+def _depth_cap(tree, max_depth):
+    depth = np.zeros(tree.node_count, dtype=np.int64)
+    for node in range(tree.node_count): # Parents always have smaller numbers than their children
+        if tree.children_left[node] != LEAF:
+            depth[tree.children_left[node]] = depth[tree.children_right[node]] = depth[node] + 1
+    return depth >= max_depth
+
+
+# A split whose two leaves predict almost the same wave height (difference <= tolerance in meters) is removed,
+# starting at the bottom, so whole sub trees can collapse into one leaf
+def _prunable(tree, tolerance):
+    left, right, value = tree.children_left, tree.children_right, tree.value[:, 0, 0]
+    make_leaf = left == LEAF
+    for node in range(tree.node_count - 1, -1, -1): # Children before their parents
+        if left[node] != LEAF and make_leaf[left[node]] and make_leaf[right[node]]:
+            make_leaf[node] = abs(value[left[node]] - value[right[node]]) <= tolerance
+    return make_leaf
+
+
+# Compiled forest with float32 thresholds and values and int32 node numbers (20 instead of 72 bytes per node)
+# A float32 feature is <= a float64 threshold exactly when it is <= that threshold rounded DOWN to float32,
+# so rounding down keeps every split identical
+def _float32_forest(model):
+    forest = forest_engine.compile_forest(model)
+    threshold = forest.threshold.astype(np.float32)
+    rounded_up = threshold.astype(np.float64) > forest.threshold
+    threshold[rounded_up] = np.nextafter(threshold[rounded_up], np.float32(-np.inf))
+    forest.threshold = threshold
+    forest.value = forest.value.astype(np.float32)
+    return forest
+
+
+# Here we build a smaller variant of a trained random forest:
+# n_trees keeps only the first trees, max_depth cuts every tree at that depth, prune_tolerance merges similar leaves
+# and float32 stores the result as a compiled forest (forest_engine.CompiledForest, which has the same predict method)
+def make_variant(model, n_trees=None, max_depth=None, prune_tolerance=None, float32=False):
+    variant = copy.deepcopy(model)
+    if n_trees is not None:
+        variant.estimators_ = variant.estimators_[:n_trees]
+        variant.n_estimators = len(variant.estimators_)
+    for estimator in variant.estimators_:
+        if max_depth is not None:
+            estimator.tree_ = _rebuild_tree(estimator.tree_, _depth_cap(estimator.tree_, max_depth))
+        if prune_tolerance is not None:
+            estimator.tree_ = _rebuild_tree(estimator.tree_, _prunable(estimator.tree_, prune_tolerance))
+    return _float32_forest(variant) if float32 else variant
+
+
+# Here we measure one saved variant: file size, load time, prediction time for 1 and 1000 rows and the error
+def benchmark(path, X_test, y_test, reference, repeats=20):
+    start = time.perf_counter()
+    model = load(path)
+    load_seconds = time.perf_counter() - start
+
+    latency = {}
+    for n_rows in (1, 1000):
+        X = X_test[np.arange(n_rows) % len(X_test)]
+        start = time.perf_counter()
+        for _ in range(repeats):
+            model.predict(X)
+        latency[n_rows] = (time.perf_counter() - start) / repeats
+
+    prediction = model.predict(X_test)
+    return {
+        "size_mb": round(os.path.getsize(path) / 1e6, 2),
+        "load_ms": round(load_seconds * 1000, 1),
+        "predict_1_ms": round(latency[1] * 1000, 3),
+        "predict_1000_ms": round(latency[1000] * 1000, 3),
+        "rmse": round(float(np.sqrt(np.mean((prediction - y_test) ** 2))), 4) if y_test is not None else None,
+        "rmse_vs_full": round(float(np.sqrt(np.mean((prediction - reference) ** 2))), 4),
+    }
+
+
+# Command line: python compact_model.py [--model wave_height_model.joblib] [--data holdout.csv] [--output-dir model_variants]
+# Every variant is saved as .joblib (so MODEL_PATH or a registry version can point to it) and compared in one table.
+# Without --data the RMSE against observations is not available, the variants are compared on random rows instead.
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build smaller variants of the wave height model and compare them")
+    parser.add_argument("--model", default="wave_height_model.joblib", help="trained random forest")
+    parser.add_argument("--data", default=None, help="holdout table (CSV or Parquet) with the feature columns and 'wave_height'")
+    parser.add_argument("--output-dir", default="model_variants", help="folder for the variants and report.json")
+    parser.add_argument("--variants", nargs="*", default=list(VARIANTS), help="names of the variants to build")
+    args = parser.parse_args(argv)
+
+    model = load(args.model)
+    if args.data:
+        from train_model import load_dataset # Feature rows and observed wave heights of the table
+        X_test, y_test = load_dataset(args.data)
+    else:
+        random = np.random.default_rng(0)
+        X_test = random.uniform(FEATURE_LOW, FEATURE_HIGH, size=(5000, len(FEATURE_COLUMNS)))
+        y_test = None
+    reference = model.predict(X_test)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    report = {}
+    for name in args.variants:
+        path = os.path.join(args.output_dir, f"{name}.joblib")
+        start = time.perf_counter()
+        dump(make_variant(model, **VARIANTS[name]), path)
+        report[name] = dict(benchmark(path, X_test, y_test, reference), build_s=round(time.perf_counter() - start, 2))
+
+    with open(os.path.join(args.output_dir, "report.json"), "w", encoding="utf-8") as report_file:
+        json.dump(report, report_file, indent=4)
+    print(f"{'variant':<12} {'size MB':>8} {'load ms':>8} {'1 row ms':>9} {'1000 rows ms':>13} {'RMSE':>7} {'vs full':>8}")
+    for name, result in report.items():
+        rmse = f"{result['rmse']:.4f}" if result["rmse"] is not None else "-"
+        print(f"{name:<12} {result['size_mb']:>8.2f} {result['load_ms']:>8.1f} {result['predict_1_ms']:>9.3f} "
+              f"{result['predict_1000_ms']:>13.3f} {rmse:>7} {result['rmse_vs_full']:>8.4f}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
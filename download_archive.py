@@ -0,0 +1,195 @@
+import argparse # Command line options of the downloader
+import json # The manifest is stored as JSON
+import os # Folders and atomic replacement of files
+import re # File names of the lakes
+import threading # One HTTP session per worker thread and a lock for the manifest
+import time # Waiting before a request is repeated
+from concurrent.futures import ThreadPoolExecutor, as_completed # A few requests at the same time
+from datetime import date, timedelta # Date ranges of the chunks
+import requests # Getting the weather data form a link request
+from lakes import swiss_lakes # List of the lakes with coordinates and webcam links
+from weather import HOURLY_VARIABLES, forecast_frame # Same variables and column names as the forecasts
+
+
+# Historical hourly weather of Open-Meteo (same parameters and response as the forecast API)
+ARCHIVE_URL = "https://archive-api.open-meteo.com/v1/archive"
+
+# One request covers one lake and at most CHUNK_DAYS days, so a failed request only repeats a small part
+CHUNK_DAYS = 92
+
+# Requests which run at the same time (the archive API limits the requests per minute)
+MAX_CONCURRENT = 4
+
+# A request which fails (network error, HTTP 429 or 5xx) is repeated up to RETRIES times, waiting 1, 2, 4, ... seconds
+RETRIES = 5
+
+
+# Here we split the date range of every lake into chunks: (lake, first day, last day)
+def plan_chunks(lakes, start, end, chunk_days=CHUNK_DAYS):
+    chunks = []
+    for lake in lakes:
+        chunk_start = start
+        while chunk_start <= end:
+            chunk_end = min(chunk_start + timedelta(days=chunk_days - 1), end)
+            chunks.append((lake, chunk_start, chunk_end))
+            chunk_start = chunk_end + timedelta(days=1)
+    return chunks
+
+
+def chunk_id(lake, start, end):
+    return f"{re.sub('[^a-z0-9]+', '_', lake['name'].lower()).strip('_')}/{start.isoformat()}_{end.isoformat()}"
+
+
+# Manifest: chunk id -> file, rows and time of the download of every finished chunk. It is written to a temporary file
+# first and then renamed, so an interrupted download never leaves half a manifest behind.
+def read_manifest(output_dir):
+    try:
+        with open(os.path.join(output_dir, "manifest.json"), encoding="utf-8") as manifest_file:
+            return json.load(manifest_file)
+    except FileNotFoundError:
+        return {}
+
+
+def write_manifest(manifest, output_dir):
+    temporary_path = os.path.join(output_dir, "manifest.json.tmp")
+    with open(temporary_path, "w", encoding="utf-8") as manifest_file:
+        json.dump(manifest, manifest_file, indent=1, sort_keys=True)
+    os.replace(temporary_path, os.path.join(output_dir, "manifest.json"))
+
+
+_sessions = threading.local() # Every worker thread keeps its own connection to the server
+
+
+def _session():
+    if not hasattr(_sessions, "session"):
+        _sessions.session = requests.Session()
+    return _sessions.session
+
+
+# Here we download one chunk, repeating it after network errors and "too many requests" or server errors
+def fetch_chunk(url, lake, start, end, retries=RETRIES):
+    params = {
+        "latitude": lake["latitude"],
+        "longitude": lake["longitude"],
+        "hourly": list(HOURLY_VARIABLES),
+        "timezone": "Europe/Zurich",
+        "start_date": start.isoformat(),
+        "end_date": end.isoformat(),
+    }
+    for attempt in range(retries + 1):
+        try:
+            response = _session().get(url, params=params, timeout=60)
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt == retries:
+                raise
+        else:
+            if (response.status_code != 429 and response.status_code < 500) or attempt == retries:
+                response.raise_for_status()
+                return forecast_frame(response.json()["hourly"])
+        time.sleep(2 ** attempt)
+
+
+# Here we download all chunks which are not in the manifest yet, MAX_CONCURRENT at a time.
+# Every chunk is saved as its own compressed Parquet file (<output_dir>/<lake>/<start>_<end>.parquet, columns "lake",
+# "Time" and the app column names, ready for build_dataset.py) and added to the manifest as soon as it is finished,
+# so after an interruption the next run continues with the missing chunks.
+def download(lakes, start, end, output_dir="weather_archive", url=ARCHIVE_URL, chunk_days=CHUNK_DAYS, max_concurrent=MAX_CONCURRENT):
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = read_manifest(output_dir)
+    manifest_lock = threading.Lock()
+    chunks = [chunk for chunk in plan_chunks(lakes, start, end, chunk_days)
+              if not (chunk_id(*chunk) in manifest and os.path.exists(os.path.join(output_dir, manifest[chunk_id(*chunk)]["file"])))]
+
+    def download_chunk(lake, chunk_start, chunk_end):
+        data = fetch_chunk(url, lake, chunk_start, chunk_end)
+        file_name = chunk_id(lake, chunk_start, chunk_end) + ".parquet"
+        path = os.path.join(output_dir, file_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data.reset_index().assign(lake=lake["name"]).to_parquet(path + ".tmp", index=False, compression="zstd")
+        os.replace(path + ".tmp", path)
+        with manifest_lock:
+            manifest[chunk_id(lake, chunk_start, chunk_end)] = {"file": file_name, "rows": len(data), "downloaded": time.strftime("%Y-%m-%dT%H:%M:%S")}
+            write_manifest(manifest, output_dir)
+        return len(data)
+
+    failed = []
+    with ThreadPoolExecutor(max_workers=max_concurrent) as pool:
+        futures = {pool.submit(download_chunk, *chunk): chunk for chunk in chunks}
+        for future in as_completed(futures):
+            lake, chunk_start, chunk_end = futures[future]
+            try:
+                print(f"{lake['name']} {chunk_start} - {chunk_end}: {future.result()} hours")
+            except Exception as error: # The other chunks continue, the next run tries this one again
+                failed.append(chunk_id(lake, chunk_start, chunk_end))
+                print(f"{lake['name']} {chunk_start} - {chunk_end}: FAILED ({error})")
+    return len(chunks) - len(failed), failed
+
+
+# Local stand-in for the archive API with deterministic made-up weather, so the downloader can be tried without
+# the internet: python download_archive.py --serve 8765, then --url http://localhost:8765/v1/archive
+# (it answers every path, so it also stands in for the forecast API: api.py --forecast-url http://localhost:8765/v1/forecast)
+# With --fail-rate 0.2 every fifth request (at random) answers with HTTP 503, to try the retries and the resume
+def serve(port, fail_rate=0.0):
+    import random # Random failures of the stand-in server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer # Small HTTP server of the standard library
+    from urllib.parse import parse_qs, urlparse # Query parameters of the request
+    import numpy as np # Made-up weather values
+    import pandas as pd # Hours of the requested range
+
+    class StandInHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if random.random() < fail_rate:
+                self.send_error(503)
+                return
+            query = parse_qs(urlparse(self.path).query)
+            hours = pd.date_range(query["start_date"][0], pd.Timestamp(query["end_date"][0]) + pd.Timedelta(hours=23), freq="h")
+            entries = []
+            for latitude in query["latitude"][0].split(","): # Several coordinates give a list, like the real API
+                seed = int(float(latitude) * 1000) + hours[0].toordinal()
+                values = np.random.default_rng(seed).random((len(hours), len(HOURLY_VARIABLES)))
+                hourly = {"time": hours.strftime("%Y-%m-%dT%H:%M").tolist()}
+                hourly.update({variable: values[:, column].round(2).tolist() for column, variable in enumerate(query["hourly"])})
+                entries.append({"hourly": hourly})
+            body = json.dumps(entries[0] if len(entries) == 1 else entries).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args): # No log line for every request
+            pass
+
+    print(f"Stand-in archive API on http://localhost:{port}/v1/archive")
+    ThreadingHTTPServer(("localhost", port), StandInHandler).serve_forever()
+
+
+# Command line: python download_archive.py --start 2015-01-01 --end 2024-12-31 [--lakes "Lake Zug" ...] [--output-dir weather_archive]
+# Run the same command again to continue an interrupted download.
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Download the hourly weather history of the lakes")
+    parser.add_argument("--start", type=date.fromisoformat, help="first day (YYYY-MM-DD)")
+    parser.add_argument("--end", type=date.fromisoformat, help="last day (YYYY-MM-DD)")
+    parser.add_argument("--lakes", nargs="*", default=None, help="names of the lakes (default: all lakes)")
+    parser.add_argument("--output-dir", default="weather_archive", help="folder for the Parquet files and manifest.json")
+    parser.add_argument("--url", default=ARCHIVE_URL, help="archive API (e.g. the local stand-in server)")
+    parser.add_argument("--chunk-days", type=int, default=CHUNK_DAYS, help="days per request")
+    parser.add_argument("--max-concurrent", type=int, default=MAX_CONCURRENT, help="requests at the same time")
+    parser.add_argument("--serve", type=int, default=None, metavar="PORT", help="start the local stand-in server instead")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="stand-in server: share of requests which fail with HTTP 503")
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        return serve(args.serve, args.fail_rate)
+    if args.start is None or args.end is None:
+        parser.error("--start and --end are required")
+    lakes = [lake for lake in swiss_lakes if args.lakes is None or lake["name"] in args.lakes]
+    start = time.perf_counter()
+    downloaded, failed = download(lakes, args.start, args.end, args.output_dir, args.url, args.chunk_days, args.max_concurrent)
+    print(f"{downloaded} chunks downloaded in {time.perf_counter() - start:.1f} s"
+          + (f", {len(failed)} failed (run the command again to continue)" if failed else ""))
+    return failed
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+import json # The training statistics are stored as JSON
+import threading # Several Streamlit sessions predict at the same time
+import numpy as np # Library for compuations in Python
+from features import FEATURE_COLUMNS, FEATURE_HIGH, FEATURE_LOW # The six features of the model and their realistic range
+
+
+# Histogram bins per feature between FEATURE_LOW and FEATURE_HIGH, plus one bin below and one above the range
+HISTOGRAM_BINS = 20
+
+# Population stability index above which a feature counts as drifted (rule of thumb: < 0.1 stable, > 0.2 shifted)
+PSI_ALERT = 0.2
+
+# Statistics of the default model (MODEL_PATH) which has no metadata: python drift.py training.csv
+TRAINING_STATS_PATH = 'wave_height_training_stats.json'
+
+
+# Streaming statistics of the feature rows: count, mean and variance (Welford, updated with a whole batch at once
+# by merging the batch statistics) and a histogram with fixed bins for every feature
+class FeatureMonitor:
+    def __init__(self, low=FEATURE_LOW, high=FEATURE_HIGH, bins=HISTOGRAM_BINS):
+        self.edges = np.linspace(low, high, bins + 1, axis=1) # (features, bins + 1)
+        self.count = 0
+        self.mean = np.zeros(len(low))
+        self.m2 = np.zeros(len(low)) # Sum of the squared differences from the mean
+        self.histogram = np.zeros((len(low), bins + 2), dtype=np.int64)
+        self.lock = threading.Lock()
+
+    def update(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if len(X) == 0:
+            return
+        batch_mean = X.mean(axis=0)
+        batch_m2 = ((X - batch_mean) ** 2).sum(axis=0)
+        # Bin 0 is below the range, bin bins + 1 above it, counted for all features with one bincount
+        n_bins = self.histogram.shape[1]
+        bin_numbers = np.stack([np.searchsorted(edges, column, side="right") for edges, column in zip(self.edges, X.T)])
+        counts = np.bincount((bin_numbers + np.arange(len(self.edges))[:, None] * n_bins).ravel(), minlength=self.histogram.size)
+        with self.lock:
+            total = self.count + len(X)
+            delta = batch_mean - self.mean
+            self.mean = self.mean + delta * len(X) / total
+            self.m2 = self.m2 + batch_m2 + delta ** 2 * self.count * len(X) / total
+            self.count = total
+            self.histogram += counts.reshape(self.histogram.shape)
+
+    def state(self):
+        with self.lock:
+            return {
+                "features": FEATURE_COLUMNS,
+                "count": self.count,
+                "mean": self.mean.tolist(),
+                "variance": (self.m2 / max(self.count - 1, 1)).tolist(),
+                "edges": self.edges.tolist(),
+                "histogram": self.histogram.tolist(),
+            }
+
+    @classmethod
+    def from_state(cls, state):
+        edges = np.asarray(state["edges"])
+        monitor = cls(edges[:, 0], edges[:, -1], edges.shape[1] - 1)
+        monitor.count = state["count"]
+        monitor.mean = np.asarray(state["mean"])
+        monitor.m2 = np.asarray(state["variance"]) * max(state["count"] - 1, 1)
+        monitor.histogram = np.asarray(state["histogram"], dtype=np.int64)
+        return monitor
+
+
+# Statistics of the training rows, stored with the model (metadata "feature_stats")
+# With "previous" (the statistics of an older training) the new rows are added to them, e.g. for a warm-start refresh
+def training_stats(X, previous=None):
+    monitor = FeatureMonitor.from_state(previous) if previous else FeatureMonitor()
+    monitor.update(X)
+    return monitor.state()
+
+
+# Population stability index of two histograms: sum of (live share - training share) * ln(live share / training share)
+def psi(live_histogram, training_histogram):
+    live = (np.asarray(live_histogram) + 0.5) / (np.sum(live_histogram) + 0.5 * len(live_histogram))
+    training = (np.asarray(training_histogram) + 0.5) / (np.sum(training_histogram) + 0.5 * len(training_histogram))
+    return float(np.sum((live - training) * np.log(live / training)))
+
+
+# Here we compare the live statistics with the training statistics, one entry per feature
+def compare(live, training):
+    report = {}
+    for feature, name in enumerate(FEATURE_COLUMNS):
+        live_std = live["variance"][feature] ** 0.5
+        entry = {
+            "live_count": live["count"],
+            "live_mean": live["mean"][feature],
+            "live_std": live_std,
+            "outside_range": (live["histogram"][feature][0] + live["histogram"][feature][-1]) / max(live["count"], 1),
+        }
+        if training is not None and live["count"] > 0:
+            training_std = training["variance"][feature] ** 0.5
+            entry.update({
+                "training_mean": training["mean"][feature],
+                "training_std": training_std,
+                "mean_shift": (live["mean"][feature] - training["mean"][feature]) / training_std if training_std > 0 else 0.0,
+                "std_ratio": live_std / training_std if training_std > 0 else 1.0,
+                "psi": psi(live["histogram"][feature], training["histogram"][feature]) if live["edges"] == training["edges"] else None,
+            })
+            entry["drifted"] = entry["psi"] is not None and entry["psi"] > PSI_ALERT
+        report[name] = entry
+    return report
+
+
+# Process wide monitors: model version -> (FeatureMonitor of the live rows, training statistics or None)
+_monitors = {}
+_monitors_lock = threading.Lock()
+
+
+# Here we add the feature rows which are given to the model of "version" (one vectorized update per batch)
+# load_training_stats is only called the first time a version is seen
+def observe(version, X, load_training_stats=lambda: None):
+    with _monitors_lock:
+        if version not in _monitors:
+            _monitors[version] = (FeatureMonitor(), load_training_stats())
+        monitor = _monitors[version][0]
+    monitor.update(X)
+
+
+# Drift report of every model version which has made predictions in this process
+def drift_metrics():
+    with _monitors_lock:
+        monitors = dict(_monitors)
+    return {version: compare(monitor.state(), training) for version, (monitor, training) in monitors.items()}
+
+
+# The same report in the text format of Prometheus, one line per version, feature and value
+def metrics_text():
+    lines = []
+    for version, report in drift_metrics().items():
+        for feature, entry in report.items():
+            for metric, value in entry.items():
+                if value is not None:
+                    lines.append(f'windlgate_feature_{metric}{{version="{version}",feature="{feature}"}} {float(value):g}')
+    return "\n".join(lines) + "\n"
+
+
+# Command line: python drift.py training.csv [output.json] writes the training statistics of the default model
+if __name__ == "__main__":
+    import sys # Command line arguments
+    from train_model import load_dataset # Feature rows of the training table
+
+    output_path = sys.argv[2] if len(sys.argv) > 2 else TRAINING_STATS_PATH
+    with open(output_path, "w", encoding="utf-8") as stats_file:
+        json.dump(training_stats(load_dataset(sys.argv[1])[0]), stats_file)
+    print(f"saved {output_path}")
@@ -0,0 +1,51 @@
+import numpy as np # Library for compuations in Python
+import pandas as pd # Helps to configurate the datasets
+
+
+# The six features of the model in the order in which it was trained
+FEATURE_COLUMNS = [
+    "Temperature (°C)",
+    "rel. Luftfeuchtigkeit (%)",
+    "Solar irradiation (watt)",
+    "Wind Speed (m/s)",
+    "Precipitation (mm)",
+    "Luftdruck (hPa)",
+]
+
+# Realistic range of every feature (same order as FEATURE_COLUMNS), used for the lookup grid, the drift histograms
+# and random benchmark rows
+FEATURE_LOW = [-10.0, 20.0, 0.0, 0.0, 0.0, 850.0]
+FEATURE_HIGH = [35.0, 100.0, 1000.0, 25.0, 10.0, 1030.0]
+
+# A prediction uses the mean values of the forecast in the following 3 hours
+WINDOW_HOURS = 3
+
+
+# Here we calculate the feature rows of ALL windows of a forecast in one vectorized pass:
+# the row of hour t holds the mean of every feature over the hours after t up to t + 3 hours
+# (the same values as the old filter "(index > t) & (index <= t + 3h)" followed by ".mean()")
+def rolling_features(forecast, hours=WINDOW_HOURS):
+    # On a regular hourly grid a window is simply the next "hours" rows, missing hours become NaN
+    hourly_index = pd.date_range(forecast.index.min(), forecast.index.max(), freq="h", name=forecast.index.name)
+    values = forecast[FEATURE_COLUMNS].reindex(hourly_index).to_numpy(dtype=float)
+    present = ~np.isnan(values)
+
+    # Cumulative sums with a leading row of zeros: the sum of the rows a..b is sums[b + 1] - sums[a]
+    zeros = np.zeros((1, values.shape[1]))
+    sums = np.vstack([zeros, np.cumsum(np.where(present, values, 0.0), axis=0)])
+    counts = np.vstack([zeros, np.cumsum(present, axis=0)])
+
+    first = np.arange(len(values)) + 1 # First row after the start hour
+    last = np.minimum(first + hours - 1, len(values) - 1) # Last row of the window (shorter at the end of the forecast)
+    window_sums = sums[last + 1] - sums[first]
+    window_counts = counts[last + 1] - counts[first]
+
+    with np.errstate(invalid="ignore", divide="ignore"): # Windows without any data get NaN
+        means = np.where(window_counts > 0, window_sums / window_counts, np.nan)
+    return pd.DataFrame(means, index=hourly_index, columns=FEATURE_COLUMNS)
+
+
+# Here we look up the feature rows of any window starts, a start time within an hour has the same window as the full hour
+# (hours 15:00, 16:00 and 17:00 for both 14:00 and 14:37), starts outside of the forecast get NaN rows
+def features_at(feature_matrix, window_starts):
+    return feature_matrix.reindex(pd.DatetimeIndex(window_starts).floor("h"))
@@ -0,0 +1,130 @@
+import time # Measures the prediction time for the benchmark
+import weakref # Remembers the compiled version of a model as long as the model exists
+import numpy as np # Library for compuations in Python
+
+
+# Rows which are traversed at the same time (limits the memory of the node table to rows x trees)
+CHUNK_ROWS = 8192
+
+
+# Compiled random forest: all trees of the forest are stored in flat NumPy arrays
+# (feature, threshold, left child, right child, value), node numbers are global over all trees and leaves point to themselves
+class CompiledForest:
+    def __init__(self, feature, threshold, left, right, value, roots, max_depth):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.is_leaf = left == np.arange(len(left))
+        self.max_depth = max_depth
+        self.n_trees = len(roots)
+
+    # Here we walk all trees for all rows at once: every step moves every (row, tree) pair one level down,
+    # pairs which reached a leaf store their value and are dropped, so the arrays shrink with every level
+    def leaf_values(self, X):
+        # scikit-learn compares float32 features with the float64 thresholds, we do the same to get identical splits
+        X = np.asarray(X, dtype=np.float32)
+        n_features = X.shape[1]
+        out = np.empty(len(X) * self.n_trees, dtype=np.float64)
+        for start in range(0, len(X), CHUNK_ROWS):
+            flat_rows = X[start:start + CHUNK_ROWS].ravel()
+            n_rows = len(flat_rows) // n_features
+            position = np.arange(start * self.n_trees, (start + n_rows) * self.n_trees) # Index of the pair in "out"
+            row_offset = np.repeat(np.arange(n_rows) * n_features, self.n_trees) # Start of the pair's row in flat_rows
+            node = np.tile(self.roots, n_rows)
+            for _ in range(self.max_depth + 1):
+                at_leaf = self.is_leaf.take(node)
+                out[position[at_leaf]] = self.value.take(node[at_leaf])
+                if at_leaf.all():
+                    break
+                walking = ~at_leaf
+                node, position, row_offset = node[walking], position[walking], row_offset[walking]
+                go_left = flat_rows.take(row_offset + self.feature.take(node)) <= self.threshold.take(node)
+                node = np.where(go_left, self.left.take(node), self.right.take(node))
+        return out.reshape(len(X), self.n_trees)
+
+    # Mean over the trees, summed tree by tree in the same order as scikit-learn, so the outputs are identical
+    def _tree_mean(self, leaf_values):
+        prediction = np.zeros(len(leaf_values))
+        for tree in range(self.n_trees):
+            prediction += leaf_values[:, tree]
+        return prediction / self.n_trees
+
+    def predict(self, X):
+        return self._tree_mean(self.leaf_values(X))
+
+    # Mean and percentiles of the individual tree outputs from the same traversal (no loop over the estimators)
+    # Returns the mean (n_rows,) and the percentiles (len(percentiles), n_rows)
+    def predict_percentiles(self, X, percentiles):
+        leaf_values = self.leaf_values(X)
+        return self._tree_mean(leaf_values), np.percentile(leaf_values, percentiles, axis=1)
+
+
+# Here we export a fitted RandomForestRegressor (single output) into one CompiledForest
+def compile_forest(model):
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset, max_depth = 0, 0
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        node_ids = np.arange(tree.node_count, dtype=np.int32) + offset
+        is_leaf = tree.children_left < 0
+        features.append(np.where(is_leaf, 0, tree.feature).astype(np.int32))
+        thresholds.append(np.where(is_leaf, 0.0, tree.threshold))
+        lefts.append(np.where(is_leaf, node_ids, tree.children_left + offset).astype(np.int32))
+        rights.append(np.where(is_leaf, node_ids, tree.children_right + offset).astype(np.int32))
+        values.append(tree.value[:, 0, 0])
+        roots.append(offset)
+        offset += tree.node_count
+        max_depth = max(max_depth, tree.max_depth)
+    return CompiledForest(
+        feature=np.concatenate(features),
+        threshold=np.concatenate(thresholds),
+        left=np.concatenate(lefts),
+        right=np.concatenate(rights),
+        value=np.concatenate(values),
+        roots=np.array(roots, dtype=np.int32),
+        max_depth=max_depth,
+    )
+
+
+_compiled_forests = weakref.WeakKeyDictionary()
+
+
+# Compiled version of a model, it is compiled only once per model object
+# (a model which is already a compiled forest, e.g. the float32 variant of compact_model.py, is used as it is)
+def compiled(model):
+    if isinstance(model, CompiledForest):
+        return model
+    if model not in _compiled_forests:
+        _compiled_forests[model] = compile_forest(model)
+    return _compiled_forests[model]
+
+
+# Benchmark: python forest_engine.py [model path] compares model.predict and the compiled forest from 1 to 100k rows
+# (the crossover in rows x trees is the basis of wave_model.COMPILED_MAX_PAIRS)
+if __name__ == "__main__":
+    import sys # Command line arguments
+    from joblib import load # To load previously trained models
+    from features import FEATURE_COLUMNS, FEATURE_HIGH, FEATURE_LOW # The six features of the model and their realistic range
+
+    model = load(sys.argv[1] if len(sys.argv) > 1 else 'wave_height_model.joblib')
+    start = time.perf_counter()
+    forest = compile_forest(model)
+    print(f"compiled {forest.n_trees} trees, {len(forest.value)} nodes, depth {forest.max_depth} in {time.perf_counter() - start:.3f} s")
+
+    # Random feature rows in a realistic range: temperature, humidity, irradiation, wind, precipitation, pressure
+    random = np.random.default_rng(0)
+    for n_rows in (1, 100, 400, 2000, 100_000):
+        X = random.uniform(FEATURE_LOW, FEATURE_HIGH, size=(n_rows, len(FEATURE_COLUMNS)))
+        repeats = max(1, min(200, 20_000 // n_rows))
+        timings = {}
+        for name, predict in (("model.predict", model.predict), ("compiled", forest.predict)):
+            start = time.perf_counter()
+            for _ in range(repeats):
+                result = predict(X)
+            timings[name] = (time.perf_counter() - start) / repeats
+        identical = np.array_equal(model.predict(X), forest.predict(X))
+        print(f"{n_rows:>7} rows ({n_rows * forest.n_trees:>9} pairs): model.predict {timings['model.predict'] * 1000:9.3f} ms, "
+              f"compiled {timings['compiled'] * 1000:9.3f} ms, speedup {timings['model.predict'] / timings['compiled']:6.1f}x, identical {identical}")
@@ -0,0 +1,22 @@
+#This is a list of lake dictionaries each containing the lake's name, coordinates and webcam URL (if available).
+swiss_lakes = [
+    {"name": "Lake Zurich", "latitude": 47.232625, "longitude": 8.704907, "webcam_url": "https://rcz.ch/webcam"}, 
+    {"name": "Lake Zug", "latitude": 47.177770, "longitude": 8.493900, "webcam_url": "https://zug-stadt.roundshot.com/"},
+    {"name": "Lake Aegeri", "latitude": 47.121541, "longitude": 8.630019, "webcam_url": "https://wildspitz.roundshot.com/"},
+    {"name": "Lake Vierwaldstettersee", "latitude": 47.000890, "longitude": 8.580360, "webcam_url": "https://www.foto-webcam.eu/webcam/brunnen/"},
+    {"name": "Lake Murtensee", "latitude": 46.933720, "longitude": 7.120470 , "webcam_url": "https://morat.roundshot.com/"},
+    {"name": "Lake Sempachersee", "latitude": 47.134330, "longitude": 8.192780, "webcam_url": "https://luks-sursee.roundshot.com/"},
+    {"name": "Lake Thunersee", "latitude": 46.714520, "longitude": 7.694180, "webcam_url": "https://content.meteobridge.com/cam/77be13b2a74ad2b8bd21d5101c18b18d/camplus.jpg"},
+    {"name": "Lake Bielersee Ipsach", "latitude": 47.117030, "longitude": 7.224540, "webcam_url": "https://boezingenberg.roundshot.com/"},
+    {"name": "Lake Neuchatel", "latitude": 46.804900, "longitude": 6.734640, "webcam_url": "https://lacdeneuchatel.roundshot.com/"},
+    {"name": "Lake Daubensee", "latitude": 46.383659, "longitude": 7.625390, "webcam_url": "https://gemmi.roundshot.com/"},
+    {"name": "Lake Bodensee", "latitude": 47.572220, "longitude": 9.377610, "webcam_url": "https://romanshorn.roundshot.com/"},
+    {"name": "Lake Luganersee", "latitude": 45.905722, "longitude": 8.972891, "webcam_url": "https://casaberno.roundshot.com/"},
+]
+
+
+# Here we use a function to generate Google Maps directions (to help create this code we used ChatGPT)
+def generate_directions_link(start_coords, end_coords): # This function creates a link to Google Maps directions between two points: start_coords and end_coords
+    start_lat, start_lon = start_coords # We separate the latitude and longitude for both starting and ending points, then return a link to Google Maps
+    end_lat, end_lon = end_coords
+    return f"https://www.google.com/maps/dir/{start_lat},{start_lon}/{end_lat},{end_lon}"
@@ -0,0 +1,42 @@
+from geopy.geocoders import Nominatim # Locations, adresses to latitude and longitude coordinates (an in other direction)
+from geopy.distance import geodesic # Calculates distance between two geographical points
+from lakes import swiss_lakes # List of the lakes with coordinates and webcam links
+
+
+# Set up the Geolocator, an object which transforms adresses in geographical coordinates (created on first use)
+_geolocator = None
+
+
+# Here we look up a place name or address, returns the geopy location (latitude, longitude, address) or None
+def geocode(query):
+    global _geolocator
+    if _geolocator is None:
+        _geolocator = Nominatim(user_agent="location_app")
+    return _geolocator.geocode(query)
+
+
+# Here we calculate the distance between a location and each lake and keep the lakes within the radius
+# Returns a list of (lake, distance in km) in the order of swiss_lakes
+def nearby_lakes(latitude, longitude, radius_km, lakes=swiss_lakes):
+    nearby = []
+    for lake in lakes:
+        distance_to_lake = geodesic((latitude, longitude), (lake["latitude"], lake["longitude"])).km
+        if distance_to_lake <= radius_km:
+            nearby.append((lake, distance_to_lake))
+    return nearby
+
+
+# This function returns an appropriate zoom level for the map, depending on the chosen radius
+def calculate_zoom_level(radius_km):
+    if radius_km <= 1:
+        return 15
+    elif radius_km <= 5:
+        return 13
+    elif radius_km <= 10:
+        return 12
+    elif radius_km <= 20:
+        return 11
+    elif radius_km <= 50:
+        return 10
+    else:
+        return 8
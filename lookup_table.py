@@ -0,0 +1,115 @@
+import json # The grid and the measured error are stored as JSON next to the values
+import time # Measures the build and lookup time
+import numpy as np # Library for compuations in Python
+from features import FEATURE_COLUMNS, FEATURE_HIGH, FEATURE_LOW # The six features of the model and their realistic range
+
+
+# Range of the grid for every feature (same order as FEATURE_COLUMNS): temperature, humidity, irradiation, wind,
+# precipitation, pressure. Values outside of the range are set to the border of the grid.
+GRID_LOW = FEATURE_LOW
+GRID_HIGH = FEATURE_HIGH
+
+# Grid points per feature: the wind has the largest influence on the waves, so it gets the finest grid
+# 10 x 6 x 6 x 26 x 6 x 6 = 336,960 points, stored as float16 that is about 0.7 MB (less when compressed)
+GRID_POINTS = [10, 6, 6, 26, 6, 6]
+
+# Random rows which are used to measure the error of the table against the forest
+ERROR_SAMPLES = 20_000
+
+
+# Lookup table: the wave height of the forest on every point of the grid, values between the points are interpolated
+# (multilinear: the 2^6 = 64 grid points around a row are weighted by their distance, so a prediction is 64 array reads)
+class LookupTable:
+    def __init__(self, values, low, high, error=None):
+        self.values = np.asarray(values, dtype=np.float32)
+        self.low = np.asarray(low, dtype=np.float64)
+        self.high = np.asarray(high, dtype=np.float64)
+        self.points = np.array(self.values.shape)
+        self.step = (self.high - self.low) / (self.points - 1)
+        self.strides = np.array([int(np.prod(self.points[axis + 1:])) for axis in range(len(self.points))])
+        self.error = error or {} # Measured error against the forest (see measure_error)
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        position = np.clip((X - self.low) / self.step, 0, self.points - 1)
+        lower = np.minimum(position.astype(np.int64), self.points - 2) # Grid point below the row on every axis
+        fraction = position - lower
+        flat_values = self.values.ravel()
+        base = lower @ self.strides
+        prediction = np.zeros(len(X))
+        for corner in range(2 ** len(self.points)):
+            upper = (corner >> np.arange(len(self.points))) & 1 # 1 = take the grid point above on that axis
+            weight = np.prod(np.where(upper, fraction, 1 - fraction), axis=1)
+            prediction += weight * flat_values.take(base + upper @ self.strides)
+        return prediction
+
+
+# Here we evaluate the forest on every point of the grid (in one call, which is fast for large batches)
+def build(model, low=GRID_LOW, high=GRID_HIGH, points=GRID_POINTS):
+    axes = [np.linspace(axis_low, axis_high, axis_points) for axis_low, axis_high, axis_points in zip(low, high, points)]
+    grid = np.stack(np.meshgrid(*axes, indexing="ij"), axis=-1).reshape(-1, len(axes))
+    values = model.predict(grid).reshape(points)
+    return LookupTable(values.astype(np.float16), low, high) # float16 is precise to about 1 mm for waves below 2 m
+
+
+# Here we compare the table with the forest on rows inside the grid, by default random rows
+# Returns the mean and largest absolute error (in meters), so we know how far the interactive values can be off
+def measure_error(table, model, X=None, samples=ERROR_SAMPLES, seed=0):
+    if X is None:
+        X = np.random.default_rng(seed).uniform(table.low, table.high, size=(samples, len(table.low)))
+    X = X[((X >= table.low) & (X <= table.high)).all(axis=1)] # Outside of the grid the table only knows the border
+    errors = np.abs(table.predict(X) - model.predict(X))
+    return {
+        "rows": int(len(X)),
+        "mean_abs_error": float(errors.mean()),
+        "p99_abs_error": float(np.percentile(errors, 99)),
+        "max_abs_error": float(errors.max()),
+    }
+
+
+# The table is saved as one compressed .npz file: the values and the grid with the measured error as JSON
+def save(table, path):
+    grid = {"features": FEATURE_COLUMNS, "low": table.low.tolist(), "high": table.high.tolist(), "error": table.error}
+    np.savez_compressed(path, values=table.values.astype(np.float16), grid=json.dumps(grid))
+
+
+def load(path):
+    with np.load(path) as data:
+        grid = json.loads(str(data["grid"]))
+        if grid["features"] != FEATURE_COLUMNS:
+            raise ValueError(f"Lookup table {path} uses the features {grid['features']}, expected {FEATURE_COLUMNS}")
+        return LookupTable(data["values"], grid["low"], grid["high"], grid["error"])
+
+
+# Command line: python lookup_table.py [model path] [output path] [training table]
+# builds the table, measures its error (on random rows and, if given, on the rows of the training table) and saves it
+if __name__ == "__main__":
+    import sys # Command line arguments
+    from joblib import load as load_model # To load previously trained models
+
+    model_path = sys.argv[1] if len(sys.argv) > 1 else "wave_height_model.joblib"
+    output_path = sys.argv[2] if len(sys.argv) > 2 else "wave_height_lookup.npz"
+    model = load_model(model_path)
+
+    start = time.perf_counter()
+    table = build(model)
+    print(f"built {table.values.size} grid points in {time.perf_counter() - start:.1f} s")
+    table.error = {"random": measure_error(table, model)}
+    if len(sys.argv) > 3:
+        from train_model import load_dataset # Feature rows of the training table
+        table.error["training_data"] = measure_error(table, model, load_dataset(sys.argv[3])[0])
+    for name, error in table.error.items():
+        print(f"{name}: {error['rows']} rows, mean error {error['mean_abs_error']:.4f} m, "
+              f"99% below {error['p99_abs_error']:.4f} m, max error {error['max_abs_error']:.4f} m")
+
+    for n_rows in (1, 100, 100_000):
+        X = np.random.default_rng(1).uniform(table.low, table.high, size=(n_rows, len(table.low)))
+        timings = {}
+        for name, predict in (("model.predict", model.predict), ("lookup table", table.predict)):
+            start = time.perf_counter()
+            predict(X)
+            timings[name] = time.perf_counter() - start
+        print(f"{n_rows:>7} rows: model.predict {timings['model.predict'] * 1000:9.3f} ms, lookup table {timings['lookup table'] * 1000:9.3f} ms")
+
+    save(table, output_path)
+    print(f"saved {output_path}")
@@ -0,0 +1,138 @@
+import json # The manifest is stored as JSON
+import os # Folders, the lock file and atomic replacement of the manifest
+import sys # Command line arguments
+import tempfile # Unique temporary file for every write of the manifest
+import time # Waiting for the lock of another training run
+import uuid # Unique name for a stale lock which is taken over
+from contextlib import contextmanager # The lock is used with a "with" block
+from datetime import datetime, timezone # Time of registration and promotion
+
+
+# Folder of the registry: one sub folder per version (written by train_model.py) and manifest.json
+REGISTRY_DIR = "models"
+ARTIFACT_NAME = "wave_height_model.joblib"
+
+
+def manifest_path(registry_dir=REGISTRY_DIR):
+    return os.path.join(registry_dir, "manifest.json")
+
+
+def artifact_path(version, registry_dir=REGISTRY_DIR):
+    return os.path.join(registry_dir, version, ARTIFACT_NAME)
+
+
+# Here we read the manifest: {"promoted": version or None, "lake_models": {lake name: version}, "versions": {version: metadata}}
+def read_manifest(registry_dir=REGISTRY_DIR):
+    try:
+        with open(manifest_path(registry_dir), encoding="utf-8") as manifest_file:
+            return json.load(manifest_file)
+    except FileNotFoundError:
+        return {"promoted": None, "lake_models": {}, "versions": {}}
+
+
+# The manifest is written to a temporary file first and then renamed, so a running app never reads half a file.
+# Every write uses its own temporary file, so two writers never rename each other's file.
+def write_manifest(manifest, registry_dir=REGISTRY_DIR):
+    os.makedirs(registry_dir, exist_ok=True)
+    file_descriptor, temporary_path = tempfile.mkstemp(prefix="manifest.", suffix=".tmp", dir=registry_dir)
+    try:
+        with os.fdopen(file_descriptor, "w", encoding="utf-8") as manifest_file:
+            json.dump(manifest, manifest_file, indent=4, ensure_ascii=False)
+        os.replace(temporary_path, manifest_path(registry_dir))
+    except BaseException:
+        os.remove(temporary_path)
+        raise
+
+
+# Lock file around read - change - write of the manifest, so two training runs at the same time (e.g. one per lake)
+# never lose a registration. Creating the file fails while another run holds it, then we wait and try again.
+# A lock file older than LOCK_STALE_SECONDS was left behind by a run which was killed and is taken over.
+LOCK_TIMEOUT_SECONDS = 60
+LOCK_STALE_SECONDS = 300
+
+
+# Here we move a stale lock out of the way. It is renamed to a unique name instead of removed, so that a waiter which
+# saw the same stale lock can never remove the fresh lock of another run: if the renamed file is not the stale lock
+# we looked at (another waiter was faster and a new lock was created in the meantime), it is put back.
+def _take_over_stale_lock(lock_path, stale_stat):
+    moved_path = f"{lock_path}.{uuid.uuid4().hex}.stale"
+    try:
+        os.replace(lock_path, moved_path)
+    except FileNotFoundError: # Another waiter has already moved it
+        return
+    if os.stat(moved_path).st_ino != stale_stat.st_ino:
+        try:
+            os.link(moved_path, lock_path) # Fails if the lock path was taken again in the meantime
+        except FileExistsError:
+            pass
+    os.remove(moved_path)
+
+
+@contextmanager
+def manifest_lock(registry_dir=REGISTRY_DIR):
+    os.makedirs(registry_dir, exist_ok=True)
+    lock_path = os.path.join(registry_dir, "manifest.lock")
+    deadline = time.monotonic() + LOCK_TIMEOUT_SECONDS
+    while True:
+        try:
+            os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            break
+        except FileExistsError:
+            try:
+                lock_stat = os.stat(lock_path)
+            except FileNotFoundError: # The other run has just released the lock
+                continue
+            if time.time() - lock_stat.st_mtime > LOCK_STALE_SECONDS:
+                _take_over_stale_lock(lock_path, lock_stat)
+                continue
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"{lock_path} is held by another process, remove it if no training run is active")
+            time.sleep(0.05)
+    try:
+        yield
+    finally:
+        os.remove(lock_path)
+
+
+# Here we add a trained version (folder with the model and metadata.json) to the manifest
+def register(version, registry_dir=REGISTRY_DIR):
+    with open(os.path.join(registry_dir, version, "metadata.json"), encoding="utf-8") as metadata_file:
+        metadata = json.load(metadata_file)
+    if not os.path.exists(artifact_path(version, registry_dir)):
+        raise FileNotFoundError(f"Version {version} has no {ARTIFACT_NAME}")
+    with manifest_lock(registry_dir):
+        manifest = read_manifest(registry_dir)
+        manifest["versions"][version] = dict(metadata, registered=datetime.now(timezone.utc).isoformat(timespec="seconds"))
+        write_manifest(manifest, registry_dir)
+    return manifest
+
+
+# Here we make a registered version the one which is used by the app (running apps pick it up on their next check)
+# A version which was trained for one lake only (metadata "lake") becomes the model of that lake
+def promote(version, registry_dir=REGISTRY_DIR):
+    with manifest_lock(registry_dir):
+        manifest = read_manifest(registry_dir)
+        if version not in manifest["versions"]:
+            raise KeyError(f"Version {version} is not registered")
+        lake = manifest["versions"][version].get("lake")
+        if lake:
+            manifest.setdefault("lake_models", {})[lake] = version
+        else:
+            manifest["promoted"] = version
+        manifest["versions"][version]["promoted_at"] = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        write_manifest(manifest, registry_dir)
+    return manifest
+
+
+# Command line: python model_registry.py list | register <version> | promote <version>
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "list"
+    if command == "register":
+        register(sys.argv[2])
+    elif command == "promote":
+        promote(sys.argv[2])
+    manifest = read_manifest()
+    promoted_versions = {manifest["promoted"], *manifest.get("lake_models", {}).values()}
+    for version, metadata in sorted(manifest["versions"].items()):
+        marker = "*" if version in promoted_versions else " "
+        print(f"{marker} {version}  {metadata.get('lake') or 'all lakes':<24} CV RMSE {metadata.get('cv_rmse', float('nan')):.3f} m  test RMSE {metadata.get('test_rmse', float('nan')):.3f} m")
@@ -0,0 +1,14 @@
+import os # Used to read the memory usage of the server process
+import sys # The memory units depend on the operating system
+
+
+# Here we read the resident memory (RSS) of the server process in megabytes
+def resident_memory_mb():
+    try:
+        with open("/proc/self/statm") as statm: # Linux: the second value is the number of resident pages
+            resident_pages = int(statm.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+    except (OSError, ValueError, IndexError):
+        import resource # Fallback for other systems: the peak memory usage
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024 # macOS reports bytes, Linux kilobytes
@@ -0,0 +1,282 @@
+import argparse # Command line options of the training command
+import copy # The refreshed model is a changed copy of the current model
+import hashlib # Fingerprint of the training data, stored with the model
+import json # The metadata of the model is stored as JSON
+import os # Folders and number of CPU cores
+import time # Measures how long the training takes
+from datetime import datetime, timezone # Version of the model (time of the training)
+import numpy as np # Library for compuations in Python
+import pandas as pd # Helps to configurate the datasets
+import sklearn # Version of scikit-learn, stored with the model
+from joblib import dump, load # To save the trained model and load the current model for a refresh
+from sklearn.experimental import enable_halving_search_cv # noqa: F401 (makes the successive halving search available)
+from sklearn.ensemble import RandomForestRegressor # Similar to the regression tasks (but predicts values)
+from sklearn.metrics import mean_squared_error # Calculates a metric for regression tasks
+from sklearn.model_selection import GridSearchCV, HalvingGridSearchCV, KFold, train_test_split # Hyperparameter search, cross-validation folds and test set
+import drift # Statistics of the training features, compared with the live features by the app
+import model_registry # Versioned models and the promoted version
+from features import FEATURE_COLUMNS # The six features of the model in the order in which it is trained
+
+
+# Column of the training table with the observed wave height (in meters)
+TARGET_COLUMN = "wave_height"
+
+# Hyperparameters which are tried by the search
+PARAM_GRID = {
+    "n_estimators": [100, 200, 400],
+    "max_depth": [None, 12, 20],
+    "min_samples_leaf": [1, 2, 5],
+    "max_features": [1.0, "sqrt"],
+}
+
+
+# Column of the training table with the name of the lake (only needed for per-lake models)
+LAKE_COLUMN = "lake"
+
+
+# Here we read the training table (CSV or Parquet) with the six feature columns and the wave height,
+# with a lake name only the rows of that lake are used
+def load_dataset(path, lake=None):
+    data = pd.read_parquet(path) if str(path).endswith(".parquet") else pd.read_csv(path)
+    if lake is not None:
+        data = data[data[LAKE_COLUMN] == lake]
+        if data.empty:
+            raise ValueError(f"Training data {path} has no rows for {lake}")
+    missing = [column for column in FEATURE_COLUMNS + [TARGET_COLUMN] if column not in data.columns]
+    if missing:
+        raise ValueError(f"Training data {path} is missing the columns {missing}")
+    data = data.dropna(subset=FEATURE_COLUMNS + [TARGET_COLUMN])
+    return data[FEATURE_COLUMNS].to_numpy(dtype=np.float64), data[TARGET_COLUMN].to_numpy(dtype=np.float64)
+
+
+# Fingerprint of the training data, so we know which data a model was trained on
+def dataset_hash(X, y):
+    return hashlib.sha1(np.ascontiguousarray(X).tobytes() + np.ascontiguousarray(y).tobytes()).hexdigest()
+
+
+# Here we split the data into the training and test set and build the cross-validation folds (lists of row indices)
+def split_dataset(X, y, cv=5, test_size=0.2, seed=42):
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=test_size, random_state=seed)
+    folds = list(KFold(n_splits=cv, shuffle=True, random_state=seed).split(X_train))
+    return X_train, X_test, y_train, y_test, folds
+
+
+# Here we keep the split data and the fold indices as .npy files, so the next run skips reading and splitting the table
+# The files are opened memory-mapped: joblib passes memory-mapped arrays to the worker processes as a file reference,
+# so all workers read the same pages instead of getting their own copy of the data
+def cached_split(data_path, cache_dir, cv=5, test_size=0.2, seed=42, lake=None):
+    stat = os.stat(data_path)
+    key = hashlib.sha1(repr((os.path.abspath(data_path), stat.st_size, stat.st_mtime_ns, cv, test_size, seed, lake)).encode()).hexdigest()[:16]
+    folder = os.path.join(cache_dir, key)
+    names = ["X_train", "X_test", "y_train", "y_test"]
+
+    if not os.path.exists(os.path.join(folder, "done")): # Written last, so a half written cache is never used
+        os.makedirs(folder, exist_ok=True)
+        X, y = load_dataset(data_path, lake=lake)
+        *arrays, folds = split_dataset(X, y, cv=cv, test_size=test_size, seed=seed)
+        for name, array in zip(names, arrays):
+            np.save(os.path.join(folder, f"{name}.npy"), np.ascontiguousarray(array))
+        for fold, (train_index, test_index) in enumerate(folds):
+            np.save(os.path.join(folder, f"fold{fold}_train.npy"), train_index)
+            np.save(os.path.join(folder, f"fold{fold}_test.npy"), test_index)
+        open(os.path.join(folder, "done"), "w").close()
+
+    arrays = [np.load(os.path.join(folder, f"{name}.npy"), mmap_mode="r") for name in names]
+    folds = [(np.load(os.path.join(folder, f"fold{fold}_train.npy"), mmap_mode="r"),
+              np.load(os.path.join(folder, f"fold{fold}_test.npy"), mmap_mode="r")) for fold in range(cv)]
+    return (*arrays, folds)
+
+
+# Here we run the hyperparameter search, every candidate and fold is fitted in its own worker process (n_jobs)
+# "grid" tries every candidate on all data, "halving" (successive halving) starts all candidates on a small part of the
+# data and only gives the best third of them three times more data in the next round
+def search(X, y, folds, method="halving", n_jobs=-1, seed=42):
+    options = {
+        "scoring": "neg_root_mean_squared_error",
+        "cv": folds,
+        "n_jobs": n_jobs,
+        "refit": True,
+    }
+    if method == "halving":
+        grid = HalvingGridSearchCV(RandomForestRegressor(random_state=seed), PARAM_GRID, factor=3, random_state=seed, **options)
+    else:
+        grid = GridSearchCV(RandomForestRegressor(random_state=seed), PARAM_GRID, **options)
+    grid.fit(X, y)
+    return grid
+
+
+# Here we save the model with its metadata as a new version: <output_dir>/<version>/wave_height_model.joblib + metadata.json
+# The model is saved without compression, so the app can memory-map it while loading (see wave_model.MMAP_MODE)
+def save_artifact(model, metadata, output_dir):
+    version_dir = os.path.join(output_dir, metadata["version"])
+    os.makedirs(version_dir, exist_ok=False)
+    dump(model, os.path.join(version_dir, "wave_height_model.joblib"))
+    with open(os.path.join(version_dir, "metadata.json"), "w", encoding="utf-8") as metadata_file:
+        json.dump(metadata, metadata_file, indent=4, ensure_ascii=False)
+    return version_dir
+
+
+# Largest increase of the holdout RMSE which is still accepted for a refreshed model (0.02 = 2 % worse)
+MAX_RMSE_INCREASE = 0.02
+
+
+# Here we refresh a trained forest without training it again: the existing trees are kept, "add_trees" new trees are
+# fitted on the new observations (warm start) and the "drop_oldest" first trees are removed, so the forest keeps its size
+# and slowly forgets old observations.
+# The new trees get their bootstrap samples and feature draws from "seed": with the random_state of the original model
+# scikit-learn would skip the seeds of the existing trees, so a refresh which keeps the size would repeat the same seeds
+def warm_start(model, X_new, y_new, add_trees=20, drop_oldest=0, seed=None):
+    model = copy.deepcopy(model)
+    model.set_params(warm_start=True, n_estimators=len(model.estimators_) + add_trees, random_state=seed)
+    model.fit(X_new, y_new)
+    model.set_params(warm_start=False)
+    if drop_oldest:
+        model.estimators_ = model.estimators_[drop_oldest:]
+        model.set_params(n_estimators=len(model.estimators_))
+    return model
+
+
+# Version (and path) of the model which is refreshed: a registry version, a model file or "promoted"
+# (the promoted model of the lake with --lake, otherwise the promoted global model)
+def base_model_path(base, output_dir, lake=None):
+    if os.path.exists(base):
+        return os.path.splitext(os.path.basename(base))[0], base
+    if base == "promoted":
+        manifest = model_registry.read_manifest(output_dir)
+        base = manifest.get("lake_models", {}).get(lake) if lake else manifest.get("promoted")
+        if base is None:
+            raise ValueError(f"No promoted model in {output_dir} to refresh, train one first or pass a model file")
+    return base, model_registry.artifact_path(base, output_dir)
+
+
+# Incremental refresh: python train_model.py --data new_week.csv --warm-start [version|path] [--holdout holdout.csv] [--promote]
+# The refreshed model is only promoted if its holdout RMSE is not more than MAX_RMSE_INCREASE worse than the current model
+def refresh(args):
+    base_version, base_path = base_model_path(args.warm_start, args.output_dir, args.lake)
+    base = load(base_path)
+    # Checked before the fit: without any tree left the refreshed forest could not predict
+    total_trees = len(base.estimators_) + args.add_trees
+    if args.add_trees < 0 or not 0 <= args.drop_oldest < total_trees:
+        raise ValueError(f"--drop-oldest must be between 0 and {total_trees - 1} ({len(base.estimators_)} trees of {base_version} "
+                         f"+ {args.add_trees} new trees) and --add-trees must not be negative")
+    base_stats = model_registry.read_manifest(args.output_dir)["versions"].get(base_version, {}).get("feature_stats") # Statistics of the trees which are kept
+    X, y = load_dataset(args.data, lake=args.lake)
+    if args.holdout:
+        X_train, y_train = X, y
+        X_test, y_test = load_dataset(args.holdout, lake=args.lake)
+    else:
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=args.test_size, random_state=args.seed)
+
+    # Every refresh gets its own seed for the new trees, derived from --seed and the version (reproducible from the metadata)
+    version = datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S")
+    tree_seed = int(np.random.SeedSequence([args.seed, int(version.replace("-", ""))]).generate_state(1)[0])
+    start = time.perf_counter()
+    model = warm_start(base, X_train, y_train, add_trees=args.add_trees, drop_oldest=args.drop_oldest, seed=tree_seed)
+    fit_seconds = time.perf_counter() - start
+
+    base_rmse = mean_squared_error(y_test, base.predict(X_test)) ** 0.5
+    test_rmse = mean_squared_error(y_test, model.predict(X_test)) ** 0.5
+    accepted = bool(test_rmse <= base_rmse * (1 + args.max_rmse_increase))
+    metadata = {
+        "version": version,
+        "features": FEATURE_COLUMNS,
+        "target": TARGET_COLUMN,
+        "lake": args.lake,
+        "base_version": base_version,
+        "added_trees": args.add_trees,
+        "dropped_trees": args.drop_oldest,
+        "n_trees": len(model.estimators_),
+        "test_rmse": float(test_rmse),
+        "base_test_rmse": float(base_rmse),
+        "holdout": os.path.abspath(args.holdout) if args.holdout else None,
+        "accepted": accepted,
+        "fit_seconds": round(fit_seconds, 1),
+        "rows": int(len(X_train)),
+        "data": os.path.abspath(args.data),
+        "data_sha1": dataset_hash(X_train, y_train),
+        "seed": args.seed,
+        "tree_seed": tree_seed,
+        "feature_stats": drift.training_stats(X_train, base_stats),
+        "sklearn_version": sklearn.__version__,
+    }
+    version_dir = save_artifact(model, metadata, args.output_dir)
+    model_registry.register(metadata["version"], args.output_dir)
+    if args.promote and accepted:
+        model_registry.promote(metadata["version"], args.output_dir)
+    print(f"Saved {version_dir}: refreshed {base_version} with {args.add_trees} new trees ({args.drop_oldest} dropped), "
+          f"holdout RMSE {base_rmse:.3f} m -> {test_rmse:.3f} m" + ("" if accepted else ", NOT accepted for promotion"))
+    return version_dir
+
+
+# Training command: python train_model.py --data training.parquet [--search halving|grid] [--output-dir models] [--n-jobs -1]
+# (with --warm-start the current model is refreshed with the new data, see refresh)
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the wave height model")
+    parser.add_argument("--data", required=True, help="training table (CSV or Parquet) with the feature columns and 'wave_height'")
+    parser.add_argument("--output-dir", default=model_registry.REGISTRY_DIR, help="model registry folder for the versioned model artifacts")
+    parser.add_argument("--promote", action="store_true", help="make the new version the one which is used by the app")
+    parser.add_argument("--lake", default=None, help="train a model for this lake only (rows with this 'lake' value)")
+    parser.add_argument("--cv", type=int, default=5, help="number of cross-validation folds")
+    parser.add_argument("--test-size", type=float, default=0.2, help="share of the data kept back for the test score")
+    parser.add_argument("--search", choices=["halving", "grid"], default="halving", help="successive halving or exhaustive grid search")
+    parser.add_argument("--cache-dir", default=".train_cache", help="folder for the cached split data and CV folds ('' to disable)")
+    parser.add_argument("--n-jobs", type=int, default=-1, help="worker processes for the search (-1 = all cores)")
+    parser.add_argument("--seed", type=int, default=42, help="random seed, the same seed and data give the same model")
+    parser.add_argument("--warm-start", nargs="?", const="promoted", default=None, help="refresh this model (version, file or 'promoted') with the new data instead of training from scratch")
+    parser.add_argument("--add-trees", type=int, default=20, help="refresh: number of new trees which are fitted on the new data")
+    parser.add_argument("--drop-oldest", type=int, default=0, help="refresh: number of the oldest trees which are removed")
+    parser.add_argument("--holdout", default=None, help="refresh: table for the validation before the promotion (default: test split of --data)")
+    parser.add_argument("--max-rmse-increase", type=float, default=MAX_RMSE_INCREASE, help="refresh: accepted increase of the holdout RMSE (0.02 = 2 %%)")
+    args = parser.parse_args(argv)
+    if args.warm_start:
+        return refresh(args)
+
+    start = time.perf_counter()
+    if args.cache_dir:
+        X_train, X_test, y_train, y_test, folds = cached_split(args.data, args.cache_dir, cv=args.cv, test_size=args.test_size, seed=args.seed, lake=args.lake)
+    else:
+        X, y = load_dataset(args.data, lake=args.lake)
+        X_train, X_test, y_train, y_test, folds = split_dataset(X, y, cv=args.cv, test_size=args.test_size, seed=args.seed)
+    load_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    grid = search(X_train, y_train, folds, method=args.search, n_jobs=args.n_jobs, seed=args.seed)
+    fit_seconds = time.perf_counter() - start
+
+    model = grid.best_estimator_
+    test_rmse = mean_squared_error(y_test, model.predict(X_test)) ** 0.5
+    best = grid.best_index_
+    metadata = {
+        "version": datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S"),
+        "features": FEATURE_COLUMNS,
+        "target": TARGET_COLUMN,
+        "lake": args.lake,
+        "params": grid.best_params_,
+        "cv_rmse": -float(grid.cv_results_["mean_test_score"][best]),
+        "cv_rmse_std": float(grid.cv_results_["std_test_score"][best]),
+        "cv_fold_rmse": [-float(grid.cv_results_[f"split{fold}_test_score"][best]) for fold in range(args.cv)],
+        "test_rmse": float(test_rmse),
+        "search": args.search,
+        "load_seconds": round(load_seconds, 2),
+        "fit_seconds": round(fit_seconds, 1),
+        "candidates": int(grid.n_candidates_[0]) if args.search == "halving" else len(grid.cv_results_["params"]),
+        "fits": len(grid.cv_results_["params"]) * args.cv,
+        "n_jobs": args.n_jobs if args.n_jobs > 0 else os.cpu_count(),
+        "rows": int(len(X_train) + len(X_test)),
+        "data": os.path.abspath(args.data),
+        "data_sha1": dataset_hash(np.concatenate([X_train, X_test]), np.concatenate([y_train, y_test])),
+        "seed": args.seed,
+        "feature_stats": drift.training_stats(X_train),
+        "sklearn_version": sklearn.__version__,
+    }
+    version_dir = save_artifact(model, metadata, args.output_dir)
+    model_registry.register(metadata["version"], args.output_dir)
+    if args.promote:
+        model_registry.promote(metadata["version"], args.output_dir)
+    print(f"Saved {version_dir}: CV RMSE {metadata['cv_rmse']:.3f} m, test RMSE {test_rmse:.3f} m, "
+          f"{metadata['candidates']} candidates in {fit_seconds:.1f} s")
+    return version_dir
+
+
+if __name__ == "__main__":
+    main()
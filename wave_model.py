@@ -0,0 +1,350 @@
+import json # The training statistics of the default model are stored as JSON
+import os # Checks if a lookup table file exists
+import threading # Several Streamlit sessions can ask for the model at the same time
+import time # Measures how long loading the model takes
+from collections import OrderedDict # Dictionary that remembers the order in which the lake models were used
+import numpy as np # Library for compuations in Python
+import pandas as pd # Helps to configurate the datasets
+from joblib import load # To load previously trained models
+import drift # Statistics of the live features compared with the training features
+import forest_engine # Pure NumPy version of the random forest for fast small predictions
+import lookup_table # Precomputed wave heights on a grid of the features (approximate but very fast)
+import model_registry # Versioned models and the promoted version
+from features import FEATURE_COLUMNS, WINDOW_HOURS, features_at, rolling_features # Feature rows of the 3-hour windows
+from process_stats import resident_memory_mb # Memory usage of the server process
+from weather import forecast_hash # Fingerprint of the forecast data (identifies the forecast run)
+
+
+# Path of the trained wave height model (random forest)
+MODEL_PATH = 'wave_height_model.joblib'
+
+# With mmap_mode="r" joblib reads the large tree arrays from a memory-mapped file instead of building a second copy,
+# which lowers the peak memory while the model is loaded (only for artifacts which were saved without compression).
+# The pages are NOT shared between worker processes: scikit-learn copies the tree arrays into its own memory when
+# it unpickles a tree, so every process still holds a private copy of the forest once it is loaded.
+MMAP_MODE = "r"
+
+# Process wide cache: (path, mmap_mode) -> model, the model is loaded once per server process and not on every rerun
+_models = {}
+_models_lock = threading.Lock()
+_model_stats = {}
+_model_stats_lock = threading.Lock()
+
+
+# Here we load a model from disk and record the load time and the memory of the process before and after loading
+def _load(path, mmap_mode):
+    rss_before = resident_memory_mb()
+    start = time.perf_counter()
+    model = load(path, mmap_mode=mmap_mode)
+    with _model_stats_lock:
+        _model_stats[(path, mmap_mode)] = {
+            "path": path,
+            "mmap_mode": mmap_mode,
+            "load_seconds": round(time.perf_counter() - start, 3),
+            "rss_before_mb": round(rss_before, 1),
+            "rss_after_mb": round(resident_memory_mb(), 1),
+        }
+    return model
+
+
+# Function which returns the model, loading it from disk only the first time
+def get_model(path=MODEL_PATH, mmap_mode=MMAP_MODE):
+    key = (path, mmap_mode)
+    with _models_lock:
+        if key not in _models:
+            _models[key] = _load(path, mmap_mode)
+        return _models[key]
+
+
+# Report of the loaded models: load time and memory of the process before and after loading
+def model_stats():
+    with _model_stats_lock:
+        stats = [dict(stats) for stats in _model_stats.values()]
+    for entry in stats:
+        entry["rss_now_mb"] = round(resident_memory_mb(), 1)
+    return stats
+
+
+# Hot reload from the model registry: every RELOAD_CHECK_SECONDS one caller reads the manifest, and if another
+# version was promoted it loads that version and swaps it in. All other callers keep using the previous model
+# in the meantime, and sessions which already hold the old model simply finish their rerun with it.
+# Without a promoted version we fall back to MODEL_PATH. A promoted version which cannot be used (missing or broken
+# artifact, other features, not registered) is recorded in model_errors() and the previous model (MODEL_PATH on a
+# cold start) keeps serving; the version is tried again on the next check.
+RELOAD_CHECK_SECONDS = 10
+
+_current = None # (version, model)
+_current_lock = threading.Lock()
+_last_check = 0.0
+_lake_versions = {} # Lake name -> promoted version of its own model, refreshed together with the manifest
+_model_errors = {} # Version -> (time of the failed load, error message), for the global and the lake models
+
+
+# Model versions which could not be used: version -> error message
+def model_errors():
+    return {version: message for version, (_, message) in _model_errors.items()}
+
+
+# A model with other features would give wrong predictions, so such versions are never used
+def _schema_matches(metadata):
+    return metadata is not None and metadata.get("features", FEATURE_COLUMNS) == FEATURE_COLUMNS
+
+
+def _load_version(version, versions, registry_dir):
+    if version not in versions:
+        raise KeyError(f"Model version {version} is promoted but not registered")
+    if not _schema_matches(versions[version]):
+        raise ValueError(f"Model version {version} uses the features {versions[version].get('features')}, expected {FEATURE_COLUMNS}")
+    return _load(model_registry.artifact_path(version, registry_dir), MMAP_MODE)
+
+
+def get_current_model(registry_dir=model_registry.REGISTRY_DIR):
+    global _current, _last_check, _lake_versions
+    current = _current
+    if current is not None and time.monotonic() - _last_check < RELOAD_CHECK_SECONDS:
+        return current
+
+    with _current_lock:
+        if _current is not None and time.monotonic() - _last_check < RELOAD_CHECK_SECONDS:
+            return _current # Another session has just checked
+        _last_check = time.monotonic()
+        manifest = model_registry.read_manifest(registry_dir)
+        versions = manifest["versions"]
+        _lake_versions = {lake: version for lake, version in manifest.get("lake_models", {}).items()
+                          if _schema_matches(versions.get(version))}
+
+        version = manifest.get("promoted")
+        if version is not None and (_current is None or _current[0] != version):
+            try:
+                _current = (version, _load_version(version, versions, registry_dir))
+                _model_errors.pop(version, None)
+            except Exception as error: # The sessions keep working with the previous model
+                _model_errors[version] = (time.monotonic(), f"{type(error).__name__}: {error}")
+        if _current is None:
+            _current = ("default", get_model())
+        return _current
+
+
+# Per-lake models: a lake with its own promoted model (e.g. trained for its fetch length and shape) uses it,
+# all other lakes use the global model. Lake models are loaded on first use and at most MAX_LAKE_MODELS are kept,
+# the one which was not used for the longest time is dropped first.
+# A lake model is loaded outside the shared lock (only callers of the same version wait for it), and a missing or
+# unreadable artifact falls back to the global model; the load is tried again after RELOAD_CHECK_SECONDS.
+MAX_LAKE_MODELS = 4
+
+_lake_models = OrderedDict() # Version -> model
+_lake_models_lock = threading.Lock()
+_lake_model_locks = {} # Version -> lock which is held while that version is loaded
+
+
+def _cached_lake_model(version):
+    with _lake_models_lock:
+        if version in _lake_models:
+            _lake_models.move_to_end(version) # Mark the model as recently used
+            return _lake_models[version]
+    return None
+
+
+def get_lake_model(lake_name, registry_dir=model_registry.REGISTRY_DIR):
+    global_model = get_current_model(registry_dir) # Also refreshes the promoted lake models
+    version = _lake_versions.get(lake_name)
+    if version is None:
+        return global_model
+
+    lake_model = _cached_lake_model(version)
+    if lake_model is not None:
+        return version, lake_model
+
+    with _lake_models_lock:
+        version_lock = _lake_model_locks.setdefault(version, threading.Lock())
+    with version_lock:
+        lake_model = _cached_lake_model(version) # Another session may have loaded it while we waited
+        if lake_model is not None:
+            return version, lake_model
+        failed = _model_errors.get(version)
+        if failed is not None and time.monotonic() - failed[0] < RELOAD_CHECK_SECONDS:
+            return global_model
+        try:
+            lake_model = _load(model_registry.artifact_path(version, registry_dir), MMAP_MODE)
+        except Exception as error: # Missing or broken artifact: the lake page keeps working with the global model
+            _model_errors[version] = (time.monotonic(), f"{type(error).__name__}: {error}")
+            return global_model
+        _model_errors.pop(version, None)
+        with _lake_models_lock:
+            _lake_models[version] = lake_model
+            while len(_lake_models) > MAX_LAKE_MODELS:
+                _lake_models.popitem(last=False)
+    return version, lake_model
+
+
+# The compiled NumPy forest saves the fixed cost of model.predict (input validation, one call per tree), but its work
+# grows with rows x trees, so for large batches scikit-learn's tree code (one thread, the models use n_jobs=None) wins.
+# Measured with python forest_engine.py the two are equally fast at about 35 000 - 80 000 (row, tree) pairs for
+# forests of 30 to 400 trees (depending on the depth), so we use the compiled forest up to COMPILED_MAX_PAIRS pairs
+# (e.g. up to 50 rows with 400 trees and up to 666 rows with 30 trees)
+COMPILED_MAX_PAIRS = 20_000
+
+
+# Function which predicts the wave height for a feature matrix with the fastest engine for its size
+def predict_rows(model, features):
+    if hasattr(model, "estimators_") and len(features) * len(model.estimators_) <= COMPILED_MAX_PAIRS:
+        return forest_engine.compiled(model).predict(features)
+    return model.predict(features)
+
+
+# Optional: with USE_LOOKUP_TABLE = True the predictions without bands come from the precomputed lookup table of the
+# model (python lookup_table.py, the measured error is stored in the table) instead of the forest.
+# The table has no single trees, so the day curves of the app and the API then come without bands (see day_curve).
+# Models without a table file keep using the forest.
+USE_LOOKUP_TABLE = False
+LOOKUP_TABLE_PATH = 'wave_height_lookup.npz' # Table of the default model (MODEL_PATH)
+LOOKUP_TABLE_NAME = 'lookup_table.npz' # Table of a registry version: models/<version>/lookup_table.npz
+
+_lookup_tables = {} # Version -> LookupTable or None (no table file)
+_lookup_tables_lock = threading.Lock()
+
+
+def get_lookup_table(version, registry_dir=model_registry.REGISTRY_DIR):
+    with _lookup_tables_lock:
+        if version not in _lookup_tables:
+            path = LOOKUP_TABLE_PATH if version == "default" else os.path.join(registry_dir, version, LOOKUP_TABLE_NAME)
+            _lookup_tables[version] = lookup_table.load(path) if os.path.exists(path) else None
+        return _lookup_tables[version]
+
+
+# Training statistics of a model version for the drift monitoring: stored in the metadata of a registry version,
+# for the default model in drift.TRAINING_STATS_PATH (python drift.py training.csv), otherwise None
+def training_stats(version, registry_dir=model_registry.REGISTRY_DIR):
+    if version == "default":
+        if not os.path.exists(drift.TRAINING_STATS_PATH):
+            return None
+        with open(drift.TRAINING_STATS_PATH, encoding="utf-8") as stats_file:
+            return json.load(stats_file)
+    return model_registry.read_manifest(registry_dir)["versions"].get(version, {}).get("feature_stats")
+
+
+# Drift report: live feature statistics of every model version compared with its training statistics
+def drift_metrics():
+    return drift.drift_metrics()
+
+
+# Range of the tree outputs which is shown around the prediction: 10th to 90th percentile
+BAND_PERCENTILES = (10, 90)
+
+
+# Prediction cache: (lake, window start hour, forecast fingerprint, model version, with bands, lookup table) -> (height, low, high)
+# A new forecast run or a newly promoted model gives new keys, so old predictions are never used again and
+# are dropped once they are the least recently used entries
+MAX_CACHED_PREDICTIONS = 50_000
+
+_prediction_cache = OrderedDict()
+_prediction_cache_lock = threading.Lock()
+_prediction_cache_stats = {"hits": 0, "misses": 0}
+
+
+def prediction_cache_stats():
+    with _prediction_cache_lock:
+        return dict(_prediction_cache_stats, entries=len(_prediction_cache))
+
+
+# Batch prediction for many lakes and many windows with ONE prediction call per model
+# forecasts: lake name -> forecast DataFrame (columns as in weather.HOURLY_VARIABLES, indexed by time)
+# window_starts: list of start times, by default every 3 hours across each forecast
+# model: use this model for all lakes, by default every lake gets its own model or the global one (get_lake_model)
+# with_bands=True adds the columns "wave_height_low" and "wave_height_high" (BAND_PERCENTILES of the single trees)
+def predict_batch(forecasts, window_starts=None, model=None, with_bands=False):
+    lake_names, starts, versions, keys, matrices = [], [], [], [], []
+    models = {}
+    for lake_name, forecast in forecasts.items():
+        lake_starts = pd.DatetimeIndex(window_starts if window_starts is not None else forecast.index[::WINDOW_HOURS])
+        version, lake_model = ("given", model) if model is not None else get_lake_model(lake_name)
+        models[version] = lake_model
+        forecast_id = forecast_hash(forecast)
+        matrices.append(features_at(rolling_features(forecast), lake_starts).to_numpy())
+        lake_names.extend([lake_name] * len(lake_starts))
+        versions.extend([version] * len(lake_starts))
+        starts.extend(lake_starts)
+        keys.extend((lake_name, start, forecast_id, version, with_bands, USE_LOOKUP_TABLE) for start in lake_starts.floor("h"))
+
+    features = np.vstack(matrices) if matrices else np.empty((0, len(FEATURE_COLUMNS)))
+    versions = np.array(versions, dtype=object)
+    wave_heights = np.full(len(features), np.nan)
+    bands = np.full((len(BAND_PERCENTILES), len(features)), np.nan)
+
+    # Here we take the predictions which are already in the cache (a model which was passed in is never cached)
+    cacheable = np.array([version != "given" for version in versions], dtype=bool)
+    cached = np.zeros(len(features), dtype=bool)
+    with _prediction_cache_lock:
+        for row in np.flatnonzero(cacheable):
+            result = _prediction_cache.get(keys[row])
+            if result is not None:
+                _prediction_cache.move_to_end(keys[row])
+                wave_heights[row], bands[0, row], bands[-1, row] = result
+                cached[row] = True
+        _prediction_cache_stats["hits"] += int(cached.sum())
+        _prediction_cache_stats["misses"] += int((cacheable & ~cached).sum())
+
+    # Windows without forecast data (e.g. after the last hour) get no prediction
+    todo = ~np.isnan(features).any(axis=1) & ~cached
+    for version, version_model in models.items():
+        rows = todo & (versions == version)
+        if not rows.any():
+            continue
+        if version != "given":
+            drift.observe(version, features[rows], lambda: training_stats(version))
+        if with_bands:
+            # The per-tree outputs come from one traversal of the compiled forest, the mean is identical to model.predict
+            wave_heights[rows], bands[:, rows] = forest_engine.compiled(version_model).predict_percentiles(features[rows], BAND_PERCENTILES)
+        else:
+            table = get_lookup_table(version) if USE_LOOKUP_TABLE and version != "given" else None
+            wave_heights[rows] = table.predict(features[rows]) if table is not None else predict_rows(version_model, features[rows])
+
+    with _prediction_cache_lock:
+        for row in np.flatnonzero(todo & cacheable):
+            _prediction_cache[keys[row]] = (wave_heights[row], bands[0, row], bands[-1, row])
+        while len(_prediction_cache) > MAX_CACHED_PREDICTIONS:
+            _prediction_cache.popitem(last=False) # Remove the prediction which was not used for the longest time
+
+    predictions = pd.DataFrame({"lake": lake_names, "window_start": starts, "model_version": versions, "wave_height": wave_heights})
+    if with_bands:
+        predictions["wave_height_low"] = bands[0]
+        predictions["wave_height_high"] = bands[-1]
+    return predictions
+
+
+# Wave height for every hour of one day of a lake (window starts 00:00 to 23:00, indexed by window start)
+# The forecast should reach into the following day, so the 3-hour windows in the late evening are complete
+# with_bands=None: bands from the single trees, unless USE_LOOKUP_TABLE is on (then the fast table gives the heights)
+def day_curve(lake_name, forecast, day, with_bands=None):
+    if with_bands is None:
+        with_bands = not USE_LOOKUP_TABLE
+    window_starts = pd.date_range(pd.Timestamp(day), periods=24, freq="h")
+    curve = predict_batch({lake_name: forecast}, window_starts, with_bands=with_bands)
+    return curve.set_index("window_start").drop(columns=["lake", "model_version"])
+
+
+# Hour of a day curve which is shown as the headline: the current hour (the next 3 hours) if the curve is for today,
+# otherwise the hour with the highest wave. Returns (hour, True for the next 3 hours / False for the highest wave)
+def headline_hour(curve, now=None):
+    current_hour = (pd.Timestamp.now() if now is None else pd.Timestamp(now)).floor("h")
+    if current_hour in curve.index and pd.notna(curve.loc[current_hour, "wave_height"]):
+        return current_hour, True
+    return curve["wave_height"].idxmax(), False
+
+
+# Nightly job: python wave_model.py [output.csv] predicts every 3-hour window of the next 14 days for all lakes
+if __name__ == "__main__":
+    import sys # Command line arguments
+    from datetime import date, timedelta # Date range of the forecast
+    from lakes import swiss_lakes # List of the lakes with coordinates and webcam links
+    from weather import fetch_forecasts # Hourly forecasts of several lakes in one request
+
+    today = date.today()
+    forecasts = fetch_forecasts(swiss_lakes, today.isoformat(), (today + timedelta(days=14)).isoformat())
+    start = time.perf_counter()
+    predictions = predict_batch(forecasts)
+    print(f"{len(predictions)} predictions for {len(forecasts)} lakes in {time.perf_counter() - start:.3f} s")
+    if len(sys.argv) > 1:
+        predictions.to_csv(sys.argv[1], index=False)
+    else:
+        print(predictions.to_string(index=False))
@@ -0,0 +1,58 @@
+import hashlib # Creates a fingerprint (hash) of the forecast data
+import requests # Getting the weather data form a link request
+import pandas as pd # Helps to configurate the datasets
+
+
+FORECAST_URL = "https://api.open-meteo.com/v1/forecast"
+
+# Hourly variables of the API -> column names which are used in the app (and by the wave height model)
+HOURLY_VARIABLES = {
+    "temperature_2m": "Temperature (°C)",
+    "windspeed_10m": "Wind Speed (m/s)",
+    "precipitation": "Precipitation (mm)",
+    "shortwave_radiation": "Solar irradiation (watt)",
+    "surface_pressure": "Luftdruck (hPa)",
+    "relative_humidity_2m": "rel. Luftfeuchtigkeit (%)",
+}
+
+
+# Here we turn the "hourly" part of the API response into one DataFrame indexed by "Time"
+def forecast_frame(hourly):
+    forecast = pd.DataFrame({column: hourly[variable] for variable, column in HOURLY_VARIABLES.items()},
+                            index=pd.to_datetime(hourly["time"]))
+    forecast.index.name = "Time"
+    return forecast
+
+
+# Here we calculate a fingerprint of the forecast slice, the same values (and times) always give the same hash
+# (it identifies the forecast run: a new run of the weather model changes the values and therefore the hash)
+def forecast_hash(data):
+    hashed_rows = pd.util.hash_pandas_object(data, index=True).values
+    return hashlib.sha1(hashed_rows.tobytes()).hexdigest()
+
+
+# Parameters of ONE request for the hourly forecast of several lakes (the API accepts lists of coordinates)
+def forecast_params(lakes, start_date, end_date):
+    return {
+        "latitude": ",".join(str(lake["latitude"]) for lake in lakes),
+        "longitude": ",".join(str(lake["longitude"]) for lake in lakes),
+        "hourly": list(HOURLY_VARIABLES),
+        "timezone": "Europe/Zurich",
+        "start_date": start_date,
+        "end_date": end_date,
+    }
+
+
+# Here we turn the response into a dictionary: lake name -> forecast DataFrame
+def parse_forecasts(lakes, data):
+    if isinstance(data, dict): # For a single location the API returns one object instead of a list
+        data = [data]
+    return {lake["name"]: forecast_frame(entry["hourly"]) for lake, entry in zip(lakes, data)}
+
+
+# Function to get the hourly forecast of several lakes in ONE request
+# Returns a dictionary: lake name -> forecast DataFrame from start_date to end_date (format YYYY-MM-DD)
+def fetch_forecasts(lakes, start_date, end_date):
+    response = requests.get(FORECAST_URL, params=forecast_params(lakes, start_date, end_date), timeout=30)
+    response.raise_for_status()
+    return parse_forecasts(lakes, response.json())